@@ -19,28 +19,51 @@
 
 import os
 import ssl
+import atexit
 import smtplib
 import logging
 import datetime
 import webbrowser
 import tempfile
+import functools
+import threading
 
 import pandas as pd
 
-from typing import Dict, Any
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from prometheus_api_client import Metric, PrometheusConnect
 from prometheus_client import push_to_gateway
+from requests import PreparedRequest, Response
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 from thoth.slo_reporter.sli_report import SLIReport
+from thoth.slo_reporter.sli_template import HTMLTemplates
 from thoth.slo_reporter import __service_version__
 from thoth.slo_reporter.configuration import Configuration
-from thoth.slo_reporter.utils import manipulate_retrieved_metrics_vector
+from thoth.slo_reporter.utils import manipulate_retrieved_metrics_vector, demultiplex_metric_data, aggregate_metric_data
+from thoth.slo_reporter.utils import compile_server_side_reduction, slice_metric_data, parse_duration
+from thoth.slo_reporter.utils import select_query_step, select_max_source_resolution
+from thoth.slo_reporter.query_cache import QueryCache, CachedQueryClient, SharedQueryClient
+from thoth.slo_reporter.query_sharding import ShardedQueryClient
+from thoth.slo_reporter.async_client import AsyncThanosClient
+from thoth.slo_reporter.query_stats import QueryStats, record_samples, requests_response_hook
+from thoth.slo_reporter.tracing import TRACER, export_trace
+from thoth.slo_reporter.profiling import profiled
+from thoth.slo_reporter.cassette import CassettePlayer, RecordingQueryClient, get_cassette_client, is_replaying, open_cassette
+from thoth.slo_reporter.query_policy import QueryPolicy, QueryPolicyOverrides, RetryBudget, LatencyTracker, CircuitBreaker
+from thoth.slo_reporter.query_policy import PolicyQueryClient, run_with_policy
+from thoth.slo_reporter.last_known_good import LastKnownGoodStore
+from thoth.slo_reporter.ceph_cache import CEPH_READ_CACHE
 from thoth.slo_reporter.utils import store_thoth_sli_on_ceph, connect_to_ceph
+from thoth.slo_reporter.sli_storage import get_sli_object_key
+from thoth.slo_reporter.compaction import compact_sli_metrics
 
 
 _LOGGER = logging.getLogger("thoth.slo_reporter")
@@ -60,6 +83,11 @@ STORE_ON_CEPH = bool(int(os.getenv("THOTH_SLO_REPORTER_STORE_ON_CEPH", 1)))
 
 _SEND_EMAIL = bool(int(os.getenv("THOTH_SLO_REPORTER_SEND_EMAIL", 1)))
 
+_BACKFILL_SINGLE_FETCH = bool(int(os.getenv("THOTH_SLO_REPORTER_BACKFILL_SINGLE_FETCH", 1)))
+
+# Compact daily SLI metrics stored on Ceph in monthly and yearly partitions instead of reporting.
+_COMPACTION = bool(int(os.getenv("THOTH_SLO_REPORTER_COMPACTION", 0)))
+
 _DEBUG_LEVEL = bool(int(os.getenv("DEBUG_LEVEL", 0)))
 
 if _DEBUG_LEVEL:
@@ -68,13 +96,107 @@ else:
     logging.basicConfig(level=logging.INFO)
 
 
+# Clients to Prometheus/Thanos, shared by the availability check and all the runs of the process.
+_THANOS_CLIENTS: Dict[Tuple[str, str, str], Any] = {}
+_THANOS_CLIENTS_LOCK = threading.Lock()
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTP adapter applying a timeout to requests sent without any, as PrometheusConnect does."""
+
+    def __init__(self, timeout: float, **kwargs: Any):
+        """Initialize HTTP adapter.
+
+        @param timeout: seconds after which a request is cancelled.
+        """
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout: Union[None, float, Tuple[Optional[float], Optional[float]]] = None,
+        verify: Union[bool, str] = True,
+        cert: Union[None, str, Tuple[str, str]] = None,
+        proxies: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """Send a request, with the timeout of the adapter if it has none."""
+        return super().send(
+            request,
+            stream=stream,
+            timeout=self.timeout if timeout is None else timeout,
+            verify=verify,
+            cert=cert,
+            proxies=proxies,
+        )
+
+
+def get_thanos_client(configuration: Configuration) -> Any:
+    """Get client to Prometheus/Thanos, created on first use and reused afterwards to keep connections alive.
+
+    When a cassette is set, requests are recorded in it, or served from it without reaching Prometheus/Thanos.
+    """
+    client_key = (configuration.thanos_client, configuration.thanos_url, configuration.thanos_token)
+
+    with _THANOS_CLIENTS_LOCK:
+        if client_key in _THANOS_CLIENTS:
+            return _THANOS_CLIENTS[client_key]
+
+        headers = {"Authorization": f"bearer {configuration.thanos_token}"}
+
+        if is_replaying():
+            pc = None
+
+        elif configuration.thanos_client == "aiohttp":
+            pc = AsyncThanosClient(
+                url=configuration.thanos_url,
+                headers=headers,
+                disable_ssl=True,
+                max_connections=configuration.query_concurrency,
+                timeout=configuration.query_timeout,
+            )
+            atexit.register(pc.close)
+
+        elif configuration.thanos_client == "requests":
+            pc = PrometheusConnect(url=configuration.thanos_url, headers=headers, disable_ssl=True)
+            # Queries are retried by their policy only, within the retry budget of the run (see query_policy),
+            # the availability check keeps the retries of PrometheusConnect.
+            # Keep one pooled connection per concurrent request (queries, their chunks and hedged requests),
+            # so that workers do not discard connections.
+            pc._session.mount(
+                f"{pc.url.rstrip('/')}/api/",
+                _TimeoutHTTPAdapter(
+                    timeout=configuration.query_timeout,
+                    max_retries=Retry(total=0),
+                    pool_maxsize=2 * configuration.query_concurrency * configuration.query_range_chunk_concurrency,
+                ),
+            )
+            pc._session.hooks["response"].append(requests_response_hook)
+
+        else:
+            raise ValueError(f"Unknown Thanos client: {configuration.thanos_client!r}")
+
+        pc = get_cassette_client(client=pc)
+        _THANOS_CLIENTS[client_key] = pc
+
+    return pc
+
+
 def check_database_metrics_availability(configuration: Configuration) -> bool:
     """Check database metrics (Prometheus/Thanos) availability."""
-    pc = PrometheusConnect(
-        url=configuration.thanos_url,
-        headers={"Authorization": f"bearer {configuration.thanos_token}"},
-        disable_ssl=True,
-    )
+    pc = get_thanos_client(configuration)
+
+    if isinstance(pc, CassettePlayer):
+        # Responses are served from the cassette, Prometheus/Thanos is not reached.
+        return True
+
+    if isinstance(pc, RecordingQueryClient):
+        pc = pc.client
+
+    if isinstance(pc, AsyncThanosClient):
+        return pc.check_availability()
+
     response = pc._session.get(
         "{0}/".format(pc.url),
         verify=pc.ssl_verification,
@@ -89,20 +211,199 @@ def check_database_metrics_availability(configuration: Configuration) -> bool:
 
 def collect_metrics(configuration: Configuration, sli_report: SLIReport):
     """Collect metrics from Prometheus/Thanos."""
+    query_results = _execute_queries(
+        configuration=configuration,
+        sli_report=sli_report,
+        execute_query=functools.partial(_execute_query, configuration=configuration),
+    )
+
+    collected_info: Dict[str, Any] = {}
+
+    for sli_name, sli_query_results in query_results.items():
+        collected_info[sli_name] = {}
+
+        for query_result in sli_query_results:
+            collected_info[sli_name].update(query_result)
+
+    return collected_info
+
+
+def collect_metrics_backfill(
+    configuration: Configuration,
+    sli_report: SLIReport,
+    intervals: List[Tuple[datetime.datetime, datetime.datetime]],
+) -> List[Dict[str, Any]]:
+    """Collect metrics from Prometheus/Thanos for several intervals at once.
+
+    Each range query is requested once over the configuration time range, which has to cover all intervals,
+    and its samples are sliced locally per interval before being reduced.
+
+    :output: collected info for each interval, in the same order as intervals.
+    """
+    query_results = _execute_queries(
+        configuration=configuration,
+        sli_report=sli_report,
+        execute_query=functools.partial(_execute_backfill_query, configuration=configuration, intervals=intervals),
+    )
+
+    collected_infos: List[Dict[str, Any]] = [{} for _ in intervals]
+
+    for sli_name, sli_query_results in query_results.items():
+
+        for collected_info in collected_infos:
+            collected_info[sli_name] = {}
+
+        for query_result in sli_query_results:
+            for collected_info, interval_result in zip(collected_infos, query_result):
+                collected_info[sli_name].update(interval_result)
+
+    return collected_infos
+
+
+def _execute_queries(configuration: Configuration, sli_report: SLIReport, execute_query: Callable[..., Any]) -> Dict[str, List[Any]]:
+    """Execute queries of all SLI classes on a bounded thread pool.
+
+    :output: results of execute_query per SLI class, in the order queries are declared.
+    """
     pc = None
 
     if not _DRY_RUN:
-        pc = PrometheusConnect(
-            url=configuration.thanos_url,
-            headers={"Authorization": f"bearer {configuration.thanos_token}"},
-            disable_ssl=True,
+        pc = _create_query_client(configuration=configuration)
+
+    planned_queries = plan_queries(sli_report=sli_report)
+
+    query_results: Dict[str, List[Any]] = {sli_name: [] for sli_name in sli_report.report_sli_context}
+    scheduled_queries = []
+
+    _LOGGER.info(f"Executing queries with concurrency... {configuration.query_concurrency}")
+
+    # Requests sent with a deadline or hedged run on their own executor, with room for a hedged request per request.
+    policy_executor = ThreadPoolExecutor(
+        max_workers=2 * configuration.query_concurrency * configuration.query_range_chunk_concurrency,
+        thread_name_prefix="query-policy",
+    )
+    retry_budget = RetryBudget(retries=configuration.query_retry_budget)
+    circuit_breaker = None
+
+    if configuration.query_circuit_breaker_threshold:
+        circuit_breaker = CircuitBreaker(
+            threshold=configuration.query_circuit_breaker_threshold,
+            cooldown=configuration.query_circuit_breaker_cooldown,
         )
 
-    collected_info: Dict[str, Any] = {}
+    policies = _create_query_policies(
+        configuration=configuration,
+        sli_report=sli_report,
+        executor=policy_executor,
+        retry_budget=retry_budget,
+        circuit_breaker=circuit_breaker,
+    )
+
+    with ThreadPoolExecutor(max_workers=configuration.query_concurrency) as executor:
+
+        for sli_name, query_name, query_inputs in planned_queries:
+            future = executor.submit(
+                run_with_policy,
+                policies[sli_name],
+                configuration.query_stats.execute,
+                execute_query,
+                pc=pc,
+                sli_name=sli_name,
+                query_name=query_name,
+                query_inputs=query_inputs,
+            )
+            scheduled_queries.append((sli_name, future))
+
+        # Results are merged in submission order, so the collected info does not depend on completion order.
+        for sli_name, future in scheduled_queries:
+            query_results[sli_name].append(future.result())
+
+    # Requests abandoned past their deadline are not waited for, they are cancelled after the request timeout.
+    policy_executor.shutdown(wait=False)
+
+    configuration.query_stats.log_summary()
+
+    hedged = sum(policy.hedged for policy in policies.values())
+    _LOGGER.info(f"Query retries: {retry_budget.spent}/{retry_budget.retries} of the run budget, hedged requests: {hedged}")
+
+    if circuit_breaker is not None and circuit_breaker.trips:
+        _LOGGER.warning(f"Circuit breaker opened {circuit_breaker.trips} time(s), {circuit_breaker.rejected} requests failed fast.")
+
+    if isinstance(pc, SharedQueryClient):
+        _LOGGER.info(f"Requests sent: {pc.requests}, shared between consumers of identical queries: {pc.shared}")
+
+        if isinstance(pc.client, CachedQueryClient):
+            _LOGGER.info(f"Query cache hits: {pc.client.cache.hits}, misses: {pc.client.cache.misses}")
+
+    return query_results
+
+
+def _create_query_policies(
+    configuration: Configuration,
+    sli_report: SLIReport,
+    executor: ThreadPoolExecutor,
+    retry_budget: RetryBudget,
+    circuit_breaker: Optional[CircuitBreaker] = None,
+) -> Dict[str, QueryPolicy]:
+    """Create execution policy of the queries of each SLI class, sharing retry budget, circuit breaker and latencies of the run.
+
+    :output: query policy per SLI class, the configuration one overridden by SLI class query_policy.
+    """
+    latency_tracker = LatencyTracker()
+
+    policies = {}
 
     for sli_name, sli_methods in sli_report.report_sli_context.items():
-        _LOGGER.info(f"Retrieving data for... {sli_name}")
-        collected_info[sli_name] = {}
+        overrides: QueryPolicyOverrides = sli_methods.get("query_policy", {})
+
+        policies[sli_name] = QueryPolicy(
+            executor=executor,
+            retry_budget=retry_budget,
+            latency_tracker=latency_tracker,
+            deadline=overrides.get("deadline", configuration.query_deadline or None),
+            max_retries=overrides.get("max_retries", configuration.query_max_retries),
+            backoff=overrides.get("backoff", configuration.query_backoff),
+            backoff_max=overrides.get("backoff_max", configuration.query_backoff_max),
+            hedge_percentile=overrides.get("hedge_percentile", configuration.query_hedge_percentile or None),
+            circuit_breaker=circuit_breaker,
+        )
+
+    return policies
+
+
+def _create_query_client(configuration: Configuration) -> SharedQueryClient:
+    """Create client used to query Prometheus/Thanos during a run."""
+    client: Any = ShardedQueryClient(
+        client=PolicyQueryClient(client=get_thanos_client(configuration)),
+        max_points=configuration.query_range_max_points,
+        chunk_duration=parse_duration(configuration.query_range_chunk) if configuration.query_range_chunk else None,
+        max_workers=configuration.query_range_chunk_concurrency,
+    )
+
+    if configuration.query_cache_dir:
+        query_cache = QueryCache(
+            cache_dir=configuration.query_cache_dir,
+            ttl=configuration.query_cache_ttl,
+            max_size=configuration.query_cache_max_size,
+        )
+        client = CachedQueryClient(client=client, cache=query_cache, resolution=parse_duration(configuration.step))
+
+    return SharedQueryClient(client=client)
+
+
+def plan_queries(sli_report: SLIReport) -> List[Tuple[str, str, Union[str, Dict[str, Any]]]]:
+    """Plan queries of all SLI classes before they are executed.
+
+    Identical queries declared by different SLI classes (same query and range) are executed once
+    and their results are shared by all of them, see SharedQueryClient.
+
+    :output: SLI class name, query name and query inputs of each query, in the order they are declared.
+    """
+    planned_queries = []
+    unique_queries = set()
+
+    for sli_name, sli_methods in sli_report.report_sli_context.items():
+        _LOGGER.info(f"Planning queries for... {sli_name}")
 
         queries = sli_methods["query"]
 
@@ -111,55 +412,316 @@ def collect_metrics(configuration: Configuration, sli_report: SLIReport):
             continue
 
         for query_name, query_inputs in queries.items():
+            query, requires_range, *_ = _parse_query_inputs(query_inputs)
+            unique_queries.add((query, requires_range))
+            planned_queries.append((sli_name, query_name, query_inputs))
 
-            requires_range = False
+    _LOGGER.info(f"Planned {len(planned_queries)} queries, {len(unique_queries)} of them unique.")
 
-            if isinstance(query_inputs, dict):
-                query = query_inputs["query"]
-                requires_range = query_inputs["requires_range"]
-                action_type = query_inputs["type"]
-            else:
-                query = query_inputs
+    return planned_queries
 
-            _LOGGER.info(f"Querying... {query_name}")
-            _LOGGER.info(f"Using query... {query}")
 
-            try:
-                if not _DRY_RUN:
+def _parse_query_inputs(
+    query_inputs: Union[str, Dict[str, Any]],
+) -> Tuple[str, bool, Optional[str], Optional[Dict[str, Dict[str, str]]], str]:
+    """Parse query inputs declared by SLI classes.
+
+    :output: query, whether it requires range, action type, labels of grouped series and aggregation of series.
+    """
+    if isinstance(query_inputs, dict):
+        return (
+            query_inputs["query"],
+            query_inputs["requires_range"],
+            query_inputs["type"],
+            query_inputs.get("series"),
+            query_inputs.get("aggregation", "first"),
+        )
+
+    return query_inputs, False, None, None, "first"
+
 
-                    if requires_range:
-                        metric_data = pc.custom_query_range(  # type: ignore
-                            query=query,
-                            start_time=configuration.start_time,
-                            end_time=configuration.end_time,
-                            step=configuration.step,
-                        )
+def _execute_query(
+    pc: Optional[PrometheusConnect],
+    configuration: Configuration,
+    sli_name: str,
+    query_name: str,
+    query_inputs: Union[str, Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Execute a single query against Prometheus/Thanos and reduce its result to metrics.
 
-                    else:
-                        metric_data = pc.custom_query(query=query)  # type: ignore
+    A grouped query declares `series`, a map of metric names to the labels identifying each returned series,
+    and is demultiplexed into one metric per series. Any other query produces one metric named `query_name`.
+    Series of a metric are combined as declared by `aggregation` (see aggregate_metric_data), `first` by default.
+    """
+    query, requires_range, action_type, series_labels, aggregation = _parse_query_inputs(query_inputs)
 
-                    _LOGGER.info(f"Metric obtained... {metric_data}")
+    metric_names = list(series_labels) if series_labels else [query_name]
 
-                    if requires_range:
-                        metrics_vector = [float(v[1]) for v in metric_data[0]["values"] if float(v[1]) > 0]
-                        result = manipulate_retrieved_metrics_vector(metrics_vector=metrics_vector, action=action_type)
+    _LOGGER.info(f"Querying... {query_name}")
+    _LOGGER.info(f"Using query... {query}")
 
-                        collected_info[sli_name][query_name] = result
+    try:
+        if not _DRY_RUN:
+            metric_data = None
+            is_reduced = False
+            reduced_metrics: Dict[str, Any] = {}
+
+            # Series reduced server-side cannot be aggregated anymore, as reductions do not commute with aggregations.
+            if requires_range and configuration.server_side_reduction and aggregation == "first":
+                metric_data = _query_reduced_metric_data(
+                    pc=pc,  # type: ignore
+                    configuration=configuration,
+                    query=query,
+                    action_type=action_type,  # type: ignore
+                )
+                is_reduced = metric_data is not None
+
+            if metric_data is not None and series_labels:
+                # Metrics without any series in the window are retrieved by the range query, the others are kept.
+                demultiplexed_data = demultiplex_metric_data(metric_data=metric_data, series_labels=series_labels)
+                missing_labels = {metric_name: labels for metric_name, labels in series_labels.items() if not demultiplexed_data[metric_name]}
+
+                if missing_labels:
+                    _LOGGER.warning(f"Server-side reduction returned no series for {list(missing_labels)}, using client-side reduction for them.")
+                    record_samples(metric_data)
+                    reduced_metrics = _collect_metric_data(
+                        metric_data=metric_data,
+                        sli_name=sli_name,
+                        query_name=query_name,
+                        series_labels={metric_name: labels for metric_name, labels in series_labels.items() if metric_name not in missing_labels},
+                        requires_range=False,
+                        action_type=action_type,
+                    )
+                    series_labels = missing_labels
+                    metric_data = None
+                    is_reduced = False
 
-                    else:
-                        collected_info[sli_name][query_name] = float(metric_data[0]["value"][1])
+            if metric_data is None:
+
+                if requires_range:
+                    step, params = _get_range_query_parameters(
+                        configuration=configuration,
+                        query=query,
+                        window=int((configuration.end_time - configuration.start_time).total_seconds()),
+                    )
+                    metric_data = pc.custom_query_range(  # type: ignore
+                        query=query,
+                        start_time=configuration.start_time,
+                        end_time=configuration.end_time,
+                        step=step,
+                        params=params,
+                    )
 
                 else:
-                    metric_data = [{"metric": "dry run", "value": [datetime.datetime.utcnow(), 0]}]
-                    result = float(metric_data[0]["value"][1])
-                    collected_info[sli_name][query_name] = result
+                    metric_data = pc.custom_query(query=query)  # type: ignore
+
+            _LOGGER.info(f"Metric obtained... {metric_data}")
+            record_samples(metric_data)
+
+            collected_metrics = _collect_metric_data(
+                metric_data=metric_data,
+                sli_name=sli_name,
+                query_name=query_name,
+                series_labels=series_labels,
+                requires_range=requires_range and not is_reduced,
+                action_type=action_type,
+                aggregation=aggregation,
+                window=(configuration.start_time.timestamp(), configuration.end_time.timestamp()),
+            )
+            collected_metrics.update(reduced_metrics)
 
-            except Exception as e:
-                _LOGGER.exception(f"Could not gather metric for {sli_name}-{query_name}...{e}")
-                pass
-                collected_info[sli_name][query_name] = "ErrorMetricRetrieval"
+            return {metric_name: collected_metrics[metric_name] for metric_name in metric_names}
 
-    return collected_info
+        metric_data = [{"metric": "dry run", "value": [datetime.datetime.utcnow(), 0]}]
+        return {metric_name: float(metric_data[0]["value"][1]) for metric_name in metric_names}
+
+    except Exception as e:
+        _LOGGER.exception(f"Could not gather metric for {sli_name}-{query_name}...{e}")
+        return {metric_name: "ErrorMetricRetrieval" for metric_name in metric_names}
+
+
+def _execute_backfill_query(
+    pc: Optional[PrometheusConnect],
+    configuration: Configuration,
+    intervals: List[Tuple[datetime.datetime, datetime.datetime]],
+    sli_name: str,
+    query_name: str,
+    query_inputs: Union[str, Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Execute a single query for several intervals and reduce its result to metrics for each interval."""
+    query, requires_range, action_type, series_labels, aggregation = _parse_query_inputs(query_inputs)
+
+    metric_names = list(series_labels) if series_labels else [query_name]
+
+    _LOGGER.info(f"Querying... {query_name}")
+    _LOGGER.info(f"Using query... {query}")
+
+    metric_data = None
+
+    try:
+        if requires_range:
+            # Samples are reduced per interval, so the step is selected for the window of an interval.
+            step, params = _get_range_query_parameters(
+                configuration=configuration,
+                query=query,
+                window=int(max((end - start).total_seconds() for start, end in intervals)),
+            )
+            metric_data = pc.custom_query_range(  # type: ignore
+                query=query,
+                start_time=configuration.start_time,
+                end_time=configuration.end_time,
+                step=step,
+                params=params,
+            )
+            _LOGGER.info(f"Metric obtained... {metric_data}")
+            record_samples(metric_data)
+
+    except Exception as e:
+        _LOGGER.exception(f"Could not gather metric for {sli_name}-{query_name}...{e}")
+        return [{metric_name: "ErrorMetricRetrieval" for metric_name in metric_names} for _ in intervals]
+
+    collected_metrics = []
+
+    for start_time, end_time in intervals:
+        try:
+            if requires_range:
+                interval_metric_data = slice_metric_data(
+                    metric_data=metric_data,  # type: ignore
+                    start_time=start_time,
+                    end_time=end_time,
+                )
+            else:
+                interval_metric_data = pc.custom_query(query=query, params={"time": round(end_time.timestamp())})  # type: ignore
+                record_samples(interval_metric_data)
+
+            collected_metrics.append(
+                _collect_metric_data(
+                    metric_data=interval_metric_data,
+                    sli_name=sli_name,
+                    query_name=query_name,
+                    series_labels=series_labels,
+                    requires_range=requires_range,
+                    action_type=action_type,
+                    aggregation=aggregation,
+                    window=(start_time.timestamp(), end_time.timestamp()),
+                ),
+            )
+
+        except Exception as e:
+            _LOGGER.exception(f"Could not gather metric for {sli_name}-{query_name} ({end_time.strftime('%Y-%m-%d')})...{e}")
+            collected_metrics.append({metric_name: "ErrorMetricRetrieval" for metric_name in metric_names})
+
+    return collected_metrics
+
+
+def _get_range_query_parameters(configuration: Configuration, query: str, window: int) -> Tuple[str, Dict[str, Any]]:
+    """Get step and additional parameters of a range query whose samples are reduced over window seconds."""
+    if not configuration.adaptive_step:
+        return configuration.step, {}
+
+    step = select_query_step(window=window, point_budget=configuration.query_point_budget, min_step=configuration.query_min_step)
+    max_source_resolution = select_max_source_resolution(query=query, step=step)
+    _LOGGER.debug(f"Using step {step} and max source resolution {max_source_resolution} for a window of {window}s")
+
+    return step, {"max_source_resolution": max_source_resolution}
+
+
+def _query_reduced_metric_data(
+    pc: PrometheusConnect,
+    configuration: Configuration,
+    query: str,
+    action_type: str,
+) -> Optional[List[Dict[str, Any]]]:
+    """Retrieve a range query already reduced by Prometheus/Thanos with an instant query.
+
+    None is returned when the reduction cannot be done server-side, so that the caller falls back to
+    the client-side reduction of the range query. Series without any sample in the window are not returned.
+    """
+    window_seconds = int((configuration.end_time - configuration.start_time).total_seconds())
+    step, params = _get_range_query_parameters(configuration=configuration, query=query, window=window_seconds)
+    reduced_query = compile_server_side_reduction(query=query, action=action_type, window=f"{window_seconds}s", step=step)
+
+    if reduced_query is None:
+        _LOGGER.debug(f"Action {action_type} cannot be reduced server-side, using client-side reduction.")
+        return None
+
+    _LOGGER.info(f"Using server-side reduced query... {reduced_query}")
+
+    try:
+        metric_data = pc.custom_query(query=reduced_query, params={**params, "time": round(configuration.end_time.timestamp())})
+    except Exception as e:
+        _LOGGER.warning(f"Server-side reduction failed, using client-side reduction...{e}")
+        return None
+
+    if not metric_data:
+        _LOGGER.warning("Server-side reduction returned no series, using client-side reduction.")
+        return None
+
+    return metric_data
+
+
+def _collect_metric_data(
+    metric_data: List[Dict[str, Any]],
+    sli_name: str,
+    query_name: str,
+    series_labels: Optional[Dict[str, Dict[str, str]]],
+    requires_range: bool,
+    action_type: Optional[str],
+    aggregation: str = "first",
+    window: Optional[Tuple[float, float]] = None,
+) -> Dict[str, Any]:
+    """Reduce series retrieved by a query to the metrics it provides.
+
+    The window (start and end timestamps) of the query is used to extrapolate the increase of counters.
+    """
+    if not series_labels:
+        return {
+            query_name: _reduce_metric_data(
+                metric_data,
+                requires_range=requires_range,
+                action_type=action_type,
+                aggregation=aggregation,
+                window=window,
+            ),
+        }
+
+    collected_metrics: Dict[str, Any] = {}
+
+    for metric_name, metric_series in demultiplex_metric_data(metric_data=metric_data, series_labels=series_labels).items():
+        if not metric_series:
+            _LOGGER.warning(f"No series returned for {sli_name}-{metric_name} by grouped query {query_name}")
+            collected_metrics[metric_name] = "ErrorMetricRetrieval"
+        else:
+            collected_metrics[metric_name] = _reduce_metric_data(
+                metric_series,
+                requires_range=requires_range,
+                action_type=action_type,
+                aggregation=aggregation,
+                window=window,
+            )
+
+    return collected_metrics
+
+
+def _reduce_metric_data(
+    metric_data: List[Dict[str, Any]],
+    requires_range: bool,
+    action_type: Optional[str],
+    aggregation: str,
+    window: Optional[Tuple[float, float]] = None,
+) -> float:
+    """Reduce series retrieved from Prometheus/Thanos to a metric, aggregating them first."""
+    timestamps, metrics_vector = aggregate_metric_data(metric_data=metric_data, aggregation=aggregation)
+
+    if requires_range:
+        return manipulate_retrieved_metrics_vector(
+            metrics_vector=metrics_vector,
+            action=action_type,  # type: ignore
+            timestamps=timestamps,
+            window=window,
+        )
+
+    return float(metrics_vector[-1])
 
 
 def store_sli_periodic_metrics_to_ceph(
@@ -201,7 +763,7 @@ def store_sli_periodic_metrics_to_ceph(
             )
 
         _LOGGER.info(f"Storing... \n{metrics_df}")
-        ceph_path = f"{metric_class}/{metric_class}-{datetime}.csv"
+        ceph_path = get_sli_object_key(metric_class, datetime)
 
         if STORE_ON_CEPH:
             try:
@@ -248,6 +810,13 @@ def push_thoth_sli_periodic_metrics(
                 )
                 _LOGGER.info("(sli_type=%r, metric_name=%r)=%r", sli_type, metric_name, weekly_value_metric)
 
+    for record in configuration.query_stats.records:
+        labels = {"sli_type": record["sli_name"], "query_name": record["query_name"], "env": configuration.deployment_name}
+        configuration.thoth_slo_reporter_query_duration.labels(**labels).observe(record["duration"])
+        configuration.thoth_slo_reporter_query_response_bytes.labels(**labels).set(record["response_bytes"])
+        configuration.thoth_slo_reporter_query_samples.labels(**labels).set(record["samples"])
+        configuration.thoth_slo_reporter_query_retries.labels(**labels).set(record["retries"])
+
     push_to_gateway(
         configuration.pushgateway_endpoint,
         job="Weekly Thoth SLI",
@@ -256,12 +825,18 @@ def push_thoth_sli_periodic_metrics(
     _LOGGER.info("Pushed Thoth weekly SLI to Prometheus Pushgateway.")
 
 
-def generate_email(sli_metrics: Dict[str, Any], sli_report: SLIReport) -> str:
-    """Generate email to be sent."""
+def generate_email(sli_metrics: Dict[str, Any], sli_report: SLIReport, stale_metrics: Optional[Dict[str, Dict[str, str]]] = None) -> str:
+    """Generate email to be sent.
+
+    @param stale_metrics: metrics reported with their last known good value, with the end time of its run, per SLI class.
+    """
     message = sli_report.report_start
     message += sli_report.report_style
     message += sli_report.report_intro
 
+    if stale_metrics:
+        message += "\n" + HTMLTemplates.thoth_stale_metrics_template(html_inputs=stale_metrics)
+
     for sli_name, metric_data in sli_metrics.items():
 
         _LOGGER.debug(f"Generating report for: {sli_name}")
@@ -363,38 +938,79 @@ def run_slo_reporter(
     number_days: int,
     dry_run: bool,
     day_of_week: str,
+    sli_values_map: Optional[Dict[str, Any]] = None,
+    query_stats: Optional[QueryStats] = None,
 ) -> None:
-    """Run SLO reporter."""
-    configuration = Configuration(start_time=start_time, end_time=end_time, number_days=number_days, dry_run=dry_run)
+    """Run SLO reporter.
+
+    @param sli_values_map: metrics already collected for the interval (e.g. by a backfill), if any.
+    @param query_stats: cost of the queries which collected sli_values_map, pushed with the metrics.
+    """
+    configuration = Configuration(
+        start_time=start_time,
+        end_time=end_time,
+        number_days=number_days,
+        dry_run=dry_run,
+        store_on_ceph=STORE_ON_CEPH,
+    )
 
-    if not _DRY_RUN:
+    if query_stats is not None:
+        configuration.query_stats = query_stats
+
+    # SLI metrics of previous days read from Ceph are cached for the run only.
+    CEPH_READ_CACHE.reset()
+
+    if not _DRY_RUN and sli_values_map is None and not is_replaying():
         ## Check Database availability
-        is_database_available = check_database_metrics_availability(configuration=configuration)
+        with TRACER.span("check_database_metrics_availability"):
+            is_database_available = check_database_metrics_availability(configuration=configuration)
 
         if not is_database_available:
             raise Exception(f"Thanos endpoint {configuration.thanos_url} is not available! SLO-reporter cannot run.")
 
-    sli_report = SLIReport(configuration=configuration)
+    with TRACER.span("create_sli_report"):
+        sli_report = SLIReport(configuration=configuration)
+
+    # Metrics that could not be collected are reported with their last known good value, but neither stored nor pushed.
+    report_values_map: Dict[str, Any] = sli_values_map or {}
+    stale_metrics: Dict[str, Dict[str, str]] = {}
 
     # Collect metrics.
-    sli_values_map = collect_metrics(configuration=configuration, sli_report=sli_report)
+    if sli_values_map is None:
+        with TRACER.span("collect_metrics"):
+            sli_values_map = collect_metrics(configuration=configuration, sli_report=sli_report)
 
-    # Store metrics on Ceph and push them to Pushgateway.
-    if not _DRY_RUN:
-        store_sli_periodic_metrics_to_ceph(
-            periodic_metrics=sli_values_map,
-            configuration=configuration,
-            sli_report=sli_report,
-        )
+        report_values_map = sli_values_map
+        last_known_good = _get_last_known_good_store(configuration=configuration)
+
+        if last_known_good is not None:
+            report_values_map, stale_metrics = last_known_good.fill(sli_values_map)
+
+            if stale_metrics:
+                _LOGGER.warning(f"Reporting last known good values of metrics that could not be retrieved: {stale_metrics}")
+
+            if not _DRY_RUN and not is_replaying():
+                last_known_good.update(sli_values_map, end_time=configuration.end_time)
+
+    # Store metrics on Ceph and push them to Pushgateway, metrics of replayed runs were already stored and pushed by the recorded run.
+    if not _DRY_RUN and not is_replaying():
+        with TRACER.span("store_sli_periodic_metrics_to_ceph"):
+            store_sli_periodic_metrics_to_ceph(
+                periodic_metrics=sli_values_map,
+                configuration=configuration,
+                sli_report=sli_report,
+            )
 
         try:
-            push_thoth_sli_periodic_metrics(sli_values_map, configuration=configuration, sli_report=sli_report)
+            with TRACER.span("push_thoth_sli_periodic_metrics"):
+                push_thoth_sli_periodic_metrics(sli_values_map, configuration=configuration, sli_report=sli_report)
         except Exception as e_pushgateway:
             _LOGGER.exception(f"Could not push metrics to Pushgateway...{e_pushgateway}")
             pass
 
     if _DRY_RUN:
-        email_message = generate_email(sli_values_map, sli_report=sli_report)
+        with TRACER.span("generate_email"):
+            email_message = generate_email(report_values_map, sli_report=sli_report, stale_metrics=stale_metrics)
         with tempfile.NamedTemporaryFile("w", delete=False, suffix=".html") as f:
             url = "file://" + f.name
             f.write(email_message)
@@ -402,24 +1018,92 @@ def run_slo_reporter(
         webbrowser.open(url)
         return
 
-    email_message = generate_email(sli_values_map, sli_report=sli_report)
-    # Generate HTML for email from metrics and send it.
-    if not _DRY_RUN and _SEND_EMAIL:
+    with TRACER.span("generate_email"):
+        email_message = generate_email(report_values_map, sli_report=sli_report, stale_metrics=stale_metrics)
+    # Generate HTML for email from metrics and send it, the report of replayed runs was already sent by the recorded run.
+    if not _DRY_RUN and _SEND_EMAIL and not is_replaying():
         if day_of_week == configuration.email_day:
             _LOGGER.info(f"Today is: {day_of_week}, therefore I send email.")
-            send_sli_email(
-                email_message,
-                configuration=configuration,
-                sli_report=sli_report,
-                using_tls=configuration.using_tls,
-            )
+            with TRACER.span("send_sli_email"):
+                send_sli_email(
+                    email_message,
+                    configuration=configuration,
+                    sli_report=sli_report,
+                    using_tls=configuration.using_tls,
+                )
         else:
             _LOGGER.info(
                 f"Today is: {day_of_week}, I do not send emails. I send email only on {configuration.email_day}",
             )
+    _LOGGER.info(f"Ceph read cache hits: {CEPH_READ_CACHE.hits}, misses: {CEPH_READ_CACHE.misses}")
     _LOGGER.info("SLO-reporter did a good job today and finished successfully!")
 
 
+def _get_last_known_good_store(configuration: Configuration) -> Optional[LastKnownGoodStore]:
+    """Get store of last known good values, in the local file if set or on Ceph if metrics are stored there."""
+    if configuration.last_known_good_file:
+        return LastKnownGoodStore(path=configuration.last_known_good_file)
+
+    if STORE_ON_CEPH and not _DRY_RUN:
+        return LastKnownGoodStore(ceph_sli=configuration.ceph_sli)
+
+    return None
+
+
+def backfill_metrics(intervals: List[Tuple[datetime.datetime, datetime.datetime]]) -> Tuple[List[Dict[str, Any]], QueryStats]:
+    """Collect metrics for all intervals of a backfill, fetching each query once over the whole time range.
+
+    :output: collected info for each interval, and cost of the queries executed for all of them.
+    """
+    start_time = min(start for start, _ in intervals)
+    end_time = max(end for _, end in intervals)
+    _LOGGER.info(f"Backfill interval: {start_time.strftime('%Y-%m-%d')} - {end_time.strftime('%Y-%m-%d')}")
+
+    configuration = Configuration(
+        start_time=start_time,
+        end_time=end_time,
+        number_days=INTERVAL_REPORT_DAYS,
+        dry_run=_DRY_RUN,
+        store_on_ceph=STORE_ON_CEPH,
+    )
+
+    is_database_available = check_database_metrics_availability(configuration=configuration)
+
+    if not is_database_available:
+        raise Exception(f"Thanos endpoint {configuration.thanos_url} is not available! SLO-reporter cannot run.")
+
+    sli_report = SLIReport(configuration=configuration)
+
+    collected_infos = collect_metrics_backfill(configuration=configuration, sli_report=sli_report, intervals=intervals)
+    return collected_infos, configuration.query_stats
+
+
+def compact_sli_metrics_on_ceph(now: datetime.datetime) -> None:
+    """Compact daily SLI metrics of all SLI classes stored on Ceph in monthly and yearly partitions."""
+    configuration = Configuration(
+        start_time=now - datetime.timedelta(days=INTERVAL_REPORT_DAYS),
+        end_time=now,
+        number_days=INTERVAL_REPORT_DAYS,
+        dry_run=_DRY_RUN,
+        store_on_ceph=STORE_ON_CEPH,
+    )
+    sli_report = SLIReport(configuration=configuration)
+
+    for sli_name, store_columns in sli_report.report_sli_context_columns.items():
+        try:
+            stored = compact_sli_metrics(
+                ceph_sli=configuration.ceph_sli,
+                sli_name=sli_name,
+                store_columns=store_columns,
+                today=now.date(),
+                max_workers=configuration.ceph_concurrency,
+            )
+            _LOGGER.info(f"Compacted {sli_name}: {stored['months']} monthly and {stored['years']} yearly partitions stored.")
+        except Exception as e:
+            _LOGGER.exception(f"Could not compact metrics of {sli_name} on Ceph...{e}")
+
+
+@profiled
 def main():
     """Execute the main function for Thoth Service Level Objectives (SLO) Reporter."""
     if not _SEND_EMAIL:
@@ -434,6 +1118,9 @@ def main():
     if _DRY_RUN:
         _LOGGER.info("Dry run mode...")
 
+    if is_replaying():
+        _LOGGER.info("Replaying cassette, no emails will be sent and nothing will be stored on Ceph nor pushed to Pushgateway.")
+
     if EVALUATION_METRICS_DAYS == 0:
         _LOGGER.info("No range of days to be collected, set THOTH_EVALUATION_METRICS_NUMBER_DAYS at least to 1.")
 
@@ -443,20 +1130,53 @@ def main():
             f" Otherwise multiple emails (in this case {EVALUATION_METRICS_DAYS}) will be sent out.",
         )
 
+    if _COMPACTION:
+        if _DRY_RUN:
+            _LOGGER.info("Dry run mode, SLI metrics on Ceph are not compacted.")
+            return
+
+        with TRACER.span("compact_sli_metrics_on_ceph"):
+            compact_sli_metrics_on_ceph(now=datetime.datetime.utcnow())
+
+        export_trace()
+        return
+
+    # Replayed runs use the time of the recorded run, so that they request the same time ranges.
+    now = open_cassette(run_time=datetime.datetime.utcnow())
+    intervals = []
+
     for i in range(0, EVALUATION_METRICS_DAYS):
-        end_time = datetime.datetime.utcnow() - datetime.timedelta(days=i)
+        end_time = now - datetime.timedelta(days=i)
         start_time = end_time - datetime.timedelta(days=INTERVAL_REPORT_DAYS)
-        _LOGGER.info(f"Interval: {start_time.strftime('%Y-%m-%d')} - {end_time.strftime('%Y-%m-%d')}")
+        intervals.append((start_time, end_time))
 
-        day_of_week = end_time.strftime("%A")
+    backfilled_metrics: List[Optional[Dict[str, Any]]] = [None for _ in intervals]
+    backfill_query_stats = None
 
-        run_slo_reporter(
-            start_time=start_time,
-            end_time=end_time,
-            number_days=INTERVAL_REPORT_DAYS,
-            dry_run=_DRY_RUN,
-            day_of_week=day_of_week,
-        )
+    try:
+        if len(intervals) > 1 and _BACKFILL_SINGLE_FETCH and not _DRY_RUN:
+            with TRACER.span("backfill_metrics", intervals=len(intervals)):
+                backfilled_metrics, backfill_query_stats = backfill_metrics(intervals=intervals)  # type: ignore
+
+        for (start_time, end_time), sli_values_map in zip(intervals, backfilled_metrics):
+            _LOGGER.info(f"Interval: {start_time.strftime('%Y-%m-%d')} - {end_time.strftime('%Y-%m-%d')}")
+
+            day_of_week = end_time.strftime("%A")
+
+            with TRACER.span("run_slo_reporter", end_time=end_time.strftime("%Y-%m-%d")):
+                run_slo_reporter(
+                    start_time=start_time,
+                    end_time=end_time,
+                    number_days=INTERVAL_REPORT_DAYS,
+                    dry_run=_DRY_RUN,
+                    day_of_week=day_of_week,
+                    sli_values_map=sli_values_map,
+                    # Each push replaces the metrics of the previous one, so all of them carry the cost of the backfill.
+                    query_stats=backfill_query_stats,
+                )
+
+    finally:
+        export_trace()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark of collect_metrics against a local fake Thanos, in sequential and concurrent modes.
+
+Each mode runs the real collector in a separate process, so that peak RSS is measured per mode.
+
+Run from the repository root: python benchmarks/bench_collect_metrics.py --latency 0.05 --days 7
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import resource
+import subprocess
+
+from typing import Dict, List, Optional, Any
+
+_REPOSITORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, _REPOSITORY)
+
+from benchmarks.fake_thanos import start_fake_thanos  # noqa: E402
+
+# Name, Thanos client and query concurrency of each mode.
+_MODES = [
+    ("sequential", "requests", 1),
+    ("concurrent", "requests", None),
+    ("concurrent-aiohttp", "aiohttp", None),
+]
+
+
+def run_collector(url: str, thanos_client: str, concurrency: int, days: int) -> Dict[str, Any]:
+    """Run collect_metrics once against Thanos at url, in this process."""
+    os.environ["DRY_RUN"] = "0"
+
+    import app
+    from thoth.slo_reporter.configuration import Configuration
+    from thoth.slo_reporter.sli_report import SLIReport
+
+    end_time = datetime.datetime.utcnow()
+    configuration = Configuration(start_time=end_time - datetime.timedelta(days=days), end_time=end_time, number_days=days, dry_run=True)
+    configuration.thanos_url = url
+    configuration.thanos_token = "benchmark"
+    configuration.thanos_client = thanos_client
+    configuration.query_concurrency = concurrency
+
+    sli_report = SLIReport(configuration=configuration)
+
+    start = time.perf_counter()
+    collected_info = app.collect_metrics(configuration=configuration, sli_report=sli_report)
+    wall_time = time.perf_counter() - start
+
+    records = configuration.query_stats.records
+
+    return {
+        "wall_time": wall_time,
+        "queries": len(records),
+        "requests": sum(r["requests"] for r in records),
+        "errors": sum(1 for metrics in collected_info.values() for value in metrics.values() if value == "ErrorMetricRetrieval"),
+        # Kilobytes on Linux.
+        "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the benchmark, printing results of each mode."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds waited by fake Thanos before answering each request")
+    parser.add_argument("--replicas", type=int, default=1, help="series returned for each non-aggregated query")
+    parser.add_argument("--days", type=int, default=1, help="days covered by range queries")
+    parser.add_argument("--concurrency", type=int, default=8, help="query concurrency of concurrent modes")
+    parser.add_argument("--worker", nargs=3, metavar=("URL", "CLIENT", "CONCURRENCY"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        url, thanos_client, concurrency = args.worker
+        print(json.dumps(run_collector(url=url, thanos_client=thanos_client, concurrency=int(concurrency), days=args.days)))
+        return
+
+    server = start_fake_thanos(latency=args.latency, replicas=args.replicas)
+
+    print(f"Fake Thanos at {server.url}: latency {args.latency}s, {args.replicas} replica(s), range of {args.days} day(s)")
+    print(f"{'mode':>20} {'concurrency':>11} {'queries':>8} {'requests':>8} {'errors':>6} {'wall [s]':>9} {'queries/s':>9} {'peak RSS [MiB]':>14}")
+
+    for mode, thanos_client, concurrency in _MODES:
+        concurrency = concurrency or args.concurrency
+        worker = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--days", str(args.days), "--worker", server.url, thanos_client, str(concurrency)],
+            # Templates are loaded relative to the working directory.
+            cwd=_REPOSITORY,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            text=True,
+        )
+        result = json.loads(worker.stdout.strip().splitlines()[-1])
+
+        print(
+            f"{mode:>20} {concurrency:>11} {result['queries']:>8} {result['requests']:>8} {result['errors']:>6} "
+            f"{result['wall_time']:>9.2f} {result['queries'] / result['wall_time']:>9.1f} {result['peak_rss'] / 2**20:>14.1f}",
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
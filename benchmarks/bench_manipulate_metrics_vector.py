@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Micro-benchmark of the reduction of range series retrieved from Prometheus/Thanos.
+
+Compares the list based implementation previously used by SLO-reporter with the NumPy one,
+from the raw `[timestamp, "value"]` pairs returned by Prometheus/Thanos to the final metric.
+
+Run from the repository root: python benchmarks/bench_manipulate_metrics_vector.py
+"""
+
+import os
+import sys
+import math
+import random
+import statistics
+import timeit
+
+from typing import List, Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from thoth.slo_reporter.utils import manipulate_retrieved_metrics_vector, parse_metric_values  # noqa: E402
+
+_SIZES = [10**4, 10**5, 10**6]
+_ACTIONS = ["min_max", "delta", "min_max_only_ascending", "average", "latest"]
+_REPEAT = int(os.getenv("BENCHMARK_REPEAT", 5))
+
+
+def _legacy_evaluate_ascending_results(metrics_vector: List[float]) -> List[float]:
+    """Evaluate vector with only ascending values (previous implementation)."""
+    counter = 0
+    modified_vector = []
+
+    for retrieved_value in metrics_vector:
+        if counter == 0:
+            modified_vector.append(retrieved_value)
+
+        else:
+
+            if retrieved_value > metrics_vector[counter - 1]:
+                modified_vector.append(retrieved_value)
+
+        counter += 1
+
+    return modified_vector
+
+
+def _legacy_manipulate_retrieved_metrics_vector(metrics_vector: List[float], action: str) -> float:
+    """Manipulate metrics vector (previous implementation)."""
+    metric = 0.0
+    if not metrics_vector:
+        return metric
+
+    if action == "min_max":
+        metric = max(metrics_vector) - min(metrics_vector)
+
+    elif action == "delta":
+        _legacy_evaluate_ascending_results(metrics_vector=metrics_vector)
+        metric = metrics_vector[-1] - metrics_vector[0]
+
+    elif action == "min_max_only_ascending":
+        modified_results = _legacy_evaluate_ascending_results(metrics_vector=metrics_vector)
+        metric = max(modified_results) - min(modified_results)
+
+    elif action == "average":
+        metric = statistics.mean(metrics_vector)
+
+    elif action == "latest":
+        metric = metrics_vector[-1]
+
+    return metric
+
+
+def legacy_reduce(values: List[List[Any]], action: str) -> float:
+    """Reduce a range series as previously done in collect_metrics."""
+    metrics_vector = [float(v[1]) for v in values if float(v[1]) > 0]
+    return _legacy_manipulate_retrieved_metrics_vector(metrics_vector=metrics_vector, action=action)
+
+
+def numpy_reduce(values: List[List[Any]], action: str) -> float:
+    """Reduce a range series with the NumPy implementation."""
+    return manipulate_retrieved_metrics_vector(metrics_vector=parse_metric_values(values), action=action)
+
+
+def generate_values(size: int) -> List[List[Any]]:
+    """Generate values of a range series: a growing counter with resets and some 0 samples."""
+    random.seed(size)
+    values = []
+    counter = 0.0
+
+    for i in range(size):
+        counter = 0.0 if random.random() < 0.001 else counter + random.random() * 10
+        value = 0.0 if random.random() < 0.05 else counter
+        values.append([1600000000 + i * 60, str(value)])
+
+    return values
+
+
+def main() -> None:
+    """Run the benchmark, printing the best time of each implementation."""
+    print(f"{'samples':>8} {'action':>24} {'legacy [ms]':>12} {'numpy [ms]':>12} {'speedup':>8}")
+
+    for size in _SIZES:
+        values = generate_values(size)
+
+        for action in _ACTIONS:
+            legacy_result = legacy_reduce(values, action)
+            numpy_result = numpy_reduce(values, action)
+
+            if not math.isclose(legacy_result, numpy_result, rel_tol=1e-9):
+                raise ValueError(f"Results differ for {action} on {size} samples: {legacy_result} != {numpy_result}")
+
+            legacy_time = min(timeit.repeat(lambda: legacy_reduce(values, action), number=1, repeat=_REPEAT))
+            numpy_time = min(timeit.repeat(lambda: numpy_reduce(values, action), number=1, repeat=_REPEAT))
+
+            print(f"{size:>8} {action:>24} {legacy_time * 1000:>12.2f} {numpy_time * 1000:>12.2f} {legacy_time / numpy_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
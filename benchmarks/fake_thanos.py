@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Local stand-in for Thanos serving synthetic series for the queries of SLO-reporter.
+
+Series match the label matchers of each query (`label="value"`, `label=~"a|b"`) and its `by (...)` grouping,
+so that grouped queries are demultiplexed as with a real Thanos. Values are a deterministic function of
+the series and of the timestamp.
+
+Run from the repository root: python benchmarks/fake_thanos.py --port 9090 --latency 0.05
+"""
+
+import re
+import json
+import time
+import zlib
+import argparse
+import itertools
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from typing import Dict, List, Optional, Any
+
+_MATCHER = re.compile(r'(\w+)(=~|=)"((?:[^"\\]|\\.)*)"')
+_SELECTOR = re.compile(r"([a-zA-Z_:][\w:]*)\{([^}]*)\}")
+_GROUPING = re.compile(r"by \(([^)]*)\)")
+
+# Values of grouping labels not constrained by the query.
+_LABEL_VALUES = {
+    "le": ["5", "10", "30", "60", "120", "180", "300", "600", "900", "+Inf"],
+    "status": ["Succeeded", "Failed", "Error"],
+}
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def _parse_step(step: str) -> int:
+    """Parse step of a query_range, either in seconds or as duration (e.g. `1h`)."""
+    if re.fullmatch(r"\d+(\.\d+)?", step):
+        return int(float(step))
+
+    return sum(int(value) * _DURATION_UNITS[unit] for value, unit in re.findall(r"(\d+)([smhdw])", step))
+
+
+def _unescape(value: str) -> str:
+    """Unescape a regex alternative within a PromQL string literal."""
+    return re.sub(r"\\(.)", r"\1", value.replace("\\\\", "\\"))
+
+
+def series_labels(query: str, replicas: int) -> List[Dict[str, str]]:
+    """Create labels of the series returned for a query."""
+    selector = _SELECTOR.search(query)
+    matchers = _MATCHER.findall(selector.group(2)) if selector else []
+    fixed = {name: value for name, op, value in matchers if op == "="}
+    alternatives = {name: [_unescape(v) for v in value.split("|")] for name, op, value in matchers if op == "=~"}
+
+    grouping = _GROUPING.search(query)
+
+    if grouping:
+        labels = [label.strip() for label in grouping.group(1).split(",")]
+        choices = [[fixed[label]] if label in fixed else alternatives.get(label, _LABEL_VALUES.get(label, ["x"])) for label in labels]
+        identities = [dict(zip(labels, combination)) for combination in itertools.product(*choices)]
+        # Aggregations drop replica labels.
+        return identities
+
+    identities = [fixed]
+
+    if replicas > 1:
+        return [{**identity, "replica": str(replica)} for identity in identities for replica in range(replicas)]
+
+    return identities
+
+
+def series_values(labels: Dict[str, str], start: int, end: int, step: int) -> List[List[Any]]:
+    """Create values of a series, a growing counter with periodic resets."""
+    seed = zlib.crc32(json.dumps(labels, sort_keys=True).encode("utf-8"))
+    values = []
+
+    for timestamp in range(start, end + 1, step):
+        hour = timestamp // 3600
+        values.append([timestamp, str((seed % 997) + (hour % 500) * (seed % 7 + 1))])
+
+    return values
+
+
+class FakeThanosHandler(BaseHTTPRequestHandler):
+    """Handler of Prometheus HTTP API requests."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Do not log requests."""
+
+    def do_GET(self) -> None:
+        """Serve instant and range queries."""
+        url = urlparse(self.path)
+        params = {name: values[0] for name, values in parse_qs(url.query).items()}
+        server: FakeThanosServer = self.server  # type: ignore
+
+        time.sleep(server.latency)
+
+        with server.lock:
+            server.requests += 1
+
+        if url.path == "/api/v1/query_range":
+            start, end, step = int(float(params["start"])), int(float(params["end"])), _parse_step(params["step"])
+            result = [
+                {"metric": labels, "values": series_values(labels, start, end, step)}
+                for labels in series_labels(params["query"], replicas=server.replicas)
+            ]
+            body = {"status": "success", "data": {"resultType": "matrix", "result": result}}
+
+        elif url.path == "/api/v1/query":
+            timestamp = int(float(params.get("time", time.time())))
+            result = [
+                {"metric": labels, "value": series_values(labels, timestamp, timestamp, 1)[0]}
+                for labels in series_labels(params["query"], replicas=server.replicas)
+            ]
+            body = {"status": "success", "data": {"resultType": "vector", "result": result}}
+
+        else:
+            body = {"status": "success"}
+
+        content = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeThanosServer(ThreadingHTTPServer):
+    """HTTP server standing in for Thanos."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, replicas: int = 1):
+        """Initialize fake Thanos server.
+
+        @param port: port to listen on, any free port if 0.
+        @param latency: seconds waited before answering each request.
+        @param replicas: series returned for each non-aggregated query, distinguished by a replica label.
+        """
+        super().__init__((host, port), FakeThanosHandler)
+        self.latency = latency
+        self.replicas = replicas
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        """Url of the server."""
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+
+def start_fake_thanos(latency: float = 0.0, replicas: int = 1, port: int = 0) -> FakeThanosServer:
+    """Start fake Thanos server in a background thread."""
+    server = FakeThanosServer(port=port, latency=latency, replicas=replicas)
+    threading.Thread(target=server.serve_forever, name="fake-thanos", daemon=True).start()
+    return server
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Serve fake Thanos until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds waited before answering each request")
+    parser.add_argument("--replicas", type=int, default=1, help="series returned for each non-aggregated query")
+    args = parser.parse_args(argv)
+
+    server = FakeThanosServer(port=args.port, latency=args.latency, replicas=args.replicas)
+    print(f"Fake Thanos listening on {server.url}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
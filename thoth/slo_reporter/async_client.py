@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Asyncio client for Prometheus/Thanos sharing a pool of keep-alive connections."""
+
+import ssl
+import json
+import asyncio
+import logging
+import datetime
+import threading
+
+from types import ModuleType
+from typing import Dict, List, Optional, Tuple, Any
+
+from prometheus_api_client import PrometheusApiClientException
+
+from thoth.slo_reporter.query_stats import record_http_response
+
+aiohttp: Optional[ModuleType]
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class AsyncThanosClient:
+    """Query client for Prometheus/Thanos based on aiohttp.
+
+    All requests are sent from a single event loop running in a background thread, sharing one pool of keep-alive
+    connections, so that queries issued concurrently by several threads share a few TCP/TLS connections.
+    The blocking methods (`custom_query`, `custom_query_range`) make it a drop-in replacement of PrometheusConnect,
+    their coroutine counterparts (`query`, `query_range`) can be used from asyncio code.
+    """
+
+    def __init__(self, url: str, headers: Optional[Dict[str, str]] = None, disable_ssl: bool = False, max_connections: int = 4, timeout: int = 300):
+        """Initialize async Thanos client.
+
+        @param url: url of Prometheus/Thanos.
+        @param headers: headers sent with every request (e.g. authorization).
+        @param disable_ssl: disable verification of SSL certificates.
+        @param max_connections: maximum number of connections kept open to Prometheus/Thanos.
+        @param timeout: seconds after which a request is cancelled.
+        """
+        if aiohttp is None:
+            raise ImportError("aiohttp is required by the async Thanos client, install it to use it.")
+
+        self._aiohttp: ModuleType = aiohttp
+
+        self.url = url.rstrip("/")
+        self.headers = {**(headers or {}), "Accept-Encoding": "gzip"}
+        self.disable_ssl = disable_ssl
+        self.max_connections = max_connections
+        self.timeout = timeout
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="async-thanos-client", daemon=True)
+        self._thread.start()
+        self._session = self._run(self._create_session())
+
+    async def _create_session(self) -> Any:
+        """Create session (aiohttp.ClientSession), within the event loop it is bound to."""
+        # The default context verifies certificates, as the default of aiohttp does.
+        connector = self._aiohttp.TCPConnector(limit=self.max_connections, ssl=False if self.disable_ssl else ssl.create_default_context())
+        return self._aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=self._aiohttp.ClientTimeout(total=self.timeout))
+
+    def _run(self, coroutine: Any) -> Any:
+        """Run a coroutine in the event loop of the client, waiting for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> Tuple[Any, int]:
+        """Send a GET request to Prometheus/Thanos, failed requests are retried by the query policy (see query_policy).
+
+        :output: decoded response and its size in bytes.
+        """
+        params = {name: str(value) for name, value in params.items()}
+
+        try:
+            async with self._session.get(f"{self.url}{path}", params=params) as response:
+                content = await response.read()
+
+        # Raised as the OSError requests raise, so that they are retried by the query policy.
+        except self._aiohttp.ClientConnectionError as e:
+            raise ConnectionError(f"Request to {path} failed: {e!r}") from e
+        except asyncio.TimeoutError as e:
+            raise TimeoutError(f"Request to {path} did not complete within {self.timeout}s") from e
+
+        if response.status != 200:
+            raise PrometheusApiClientException(f"HTTP Status Code {response.status} ({content!r})")
+
+        return json.loads(content), len(content)
+
+    @staticmethod
+    def _range_params(
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Create parameters of a query_range request."""
+        return {"query": query, "start": round(start_time.timestamp()), "end": round(end_time.timestamp()), "step": step, **(params or {})}
+
+    async def query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Send an instant query."""
+        response, _ = await self._get("/api/v1/query", params={"query": query, **(params or {})})
+        return response["data"]["result"]  # type: ignore
+
+    async def query_range(
+        self,
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Send a query_range."""
+        response, _ = await self._get("/api/v1/query_range", params=self._range_params(query, start_time, end_time, step, params))
+        return response["data"]["result"]  # type: ignore
+
+    async def _check_availability(self) -> bool:
+        """Check Prometheus/Thanos availability."""
+        try:
+            async with self._session.get(f"{self.url}/") as response:
+                return response.status < 400
+        except self._aiohttp.ClientError as e:
+            _LOGGER.warning(f"Prometheus/Thanos is not reachable...{e}")
+            return False
+
+    def check_availability(self) -> bool:
+        """Check Prometheus/Thanos availability."""
+        return self._run(self._check_availability())  # type: ignore
+
+    def _get_result(self, path: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Send a request, waiting for its result and accounting it to the query being executed in this thread."""
+        response, response_bytes = self._run(self._get(path, params=params))
+        record_http_response(response_bytes=response_bytes)
+        return response["data"]["result"]  # type: ignore
+
+    def custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Send an instant query, waiting for its result."""
+        return self._get_result("/api/v1/query", params={"query": query, **(params or {})})
+
+    def custom_query_range(
+        self,
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Send a query_range, waiting for its result."""
+        return self._get_result("/api/v1/query_range", params=self._range_params(query, start_time, end_time, step, params))
+
+    def close(self) -> None:
+        """Close connections and stop the event loop of the client."""
+        self._run(self._session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
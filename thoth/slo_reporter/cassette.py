@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Record and replay of Prometheus/Thanos responses in cassettes (gzip compressed JSON lines).
+
+The first line of a cassette records the time of the run, so that a replayed run requests exactly the same
+time ranges. Any other line records a request (kind, query, time range, step and parameters) and its result,
+or an object read from Ceph (e.g. SLI metrics of previous days) or listed with its ETag, so that replayed runs
+do not depend on the current content of the bucket.
+"""
+
+import os
+import gzip
+import base64
+import json
+import atexit
+import logging
+import datetime
+import threading
+import collections
+
+from typing import Deque, Dict, List, Optional, Set, Any
+
+from thoth.storages.exceptions import NotFoundError
+
+from thoth.slo_reporter.sli_storage import list_objects_with_e_tags
+
+_LOGGER = logging.getLogger(__name__)
+
+_CASSETTE_FILE = os.getenv("THOTH_SLO_REPORTER_CASSETTE")
+# Either record (responses of Thanos are stored in the cassette) or replay (responses are served from the cassette).
+_CASSETTE_MODE = os.getenv("THOTH_SLO_REPORTER_CASSETTE_MODE", "record")
+
+_CASSETTES: Dict[str, Any] = {}
+_CASSETTES_LOCK = threading.Lock()
+
+
+def _create_key(kind: str, query: str, step: Optional[str], params: Dict[str, Any], exact: bool, **time_params: Any) -> str:
+    """Create key of a request, time parameters are considered only by exact keys."""
+    params = {name: value for name, value in params.items() if name != "time"}
+    key = [kind, query, step, params, time_params if exact else None]
+    return json.dumps(key, sort_keys=True, default=str)
+
+
+class CassetteRecorder:
+    """Record requests sent to Prometheus/Thanos and their results in a cassette."""
+
+    def __init__(self, path: str, recorded_at: datetime.datetime):
+        """Initialize cassette recorder, truncating the cassette.
+
+        @param path: path to the cassette.
+        @param recorded_at: time of the run recorded.
+        """
+        self.path = path
+        self.entries = 0
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._file.write(json.dumps({"recorded_at": recorded_at.isoformat()}) + "\n")
+
+    def record(self, **entry: Any) -> None:
+        """Record a request and its result."""
+        line = json.dumps(entry, default=str) + "\n"
+
+        with self._lock:
+            self._file.write(line)
+            self.entries += 1
+
+    def close(self) -> None:
+        """Close the cassette."""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                _LOGGER.info(f"Recorded {self.entries} Thanos responses and Ceph objects in cassette {self.path}")
+
+    def wrap(self, client: Any) -> "RecordingQueryClient":
+        """Wrap a client to record its requests."""
+        return RecordingQueryClient(client=client, recorder=self)
+
+    def wrap_ceph(self, ceph: Any) -> "RecordingCephStore":
+        """Wrap a Ceph store to record objects read from it."""
+        return RecordingCephStore(ceph=ceph, recorder=self)
+
+
+class RecordingQueryClient:
+    """Query client recording requests and results of the wrapped client (e.g. PrometheusConnect) in a cassette."""
+
+    def __init__(self, client: Any, recorder: CassetteRecorder):
+        """Initialize recording query client."""
+        self.client = client
+        self.recorder = recorder
+
+    def custom_query_range(
+        self,
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Send a query_range, recording its result."""
+        result = self.client.custom_query_range(query=query, start_time=start_time, end_time=end_time, step=step, params=params)
+        self.recorder.record(
+            kind="query_range",
+            query=query,
+            start=round(start_time.timestamp()),
+            end=round(end_time.timestamp()),
+            step=step,
+            params=params or {},
+            result=result,
+        )
+        return result  # type: ignore
+
+    def custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Send an instant query, recording its result."""
+        result = self.client.custom_query(query=query, params=params)
+        self.recorder.record(kind="query", query=query, params=params or {}, result=result)
+        return result  # type: ignore
+
+
+class RecordingCephStore:
+    """Ceph store recording objects read from the wrapped store (e.g. CephStore) in a cassette, once per object."""
+
+    def __init__(self, ceph: Any, recorder: CassetteRecorder):
+        """Initialize recording Ceph store."""
+        self.ceph = ceph
+        self.recorder = recorder
+        self._recorded: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate anything else (e.g. bucket, prefix or store_blob) to the wrapped store."""
+        return getattr(self.ceph, name)
+
+    def _record(self, object_key: str, blob: Optional[bytes]) -> None:
+        """Record an object read, None if it does not exist."""
+        with self._lock:
+            if object_key in self._recorded:
+                return
+
+            self._recorded.add(object_key)
+
+        self.recorder.record(kind="ceph", object_key=object_key, blob=None if blob is None else base64.b64encode(blob).decode("ascii"))
+
+    def list_objects_with_e_tags(self, prefix_addition: str) -> Dict[str, str]:
+        """List objects with their ETag, recording the listing."""
+        objects = list_objects_with_e_tags(self.ceph, prefix_addition=prefix_addition)
+        self.recorder.record(kind="ceph_listing", prefix_addition=prefix_addition, objects=objects)
+        return objects
+
+    def retrieve_blob(self, object_key: str) -> bytes:
+        """Retrieve an object, recording it."""
+        try:
+            blob = self.ceph.retrieve_blob(object_key=object_key)
+        except NotFoundError:
+            self._record(object_key, None)
+            raise
+
+        self._record(object_key, blob)
+        return blob  # type: ignore
+
+
+class CassetteCephStore:
+    """Ceph store serving objects recorded in a cassette, without any request to Ceph. Objects cannot be stored."""
+
+    def __init__(self, path: str, objects: Dict[str, Optional[str]], listings: Dict[str, Dict[str, str]]):
+        """Initialize cassette Ceph store.
+
+        @param path: path to the cassette.
+        @param objects: base64 encoded objects recorded per object key, None if they did not exist.
+        @param listings: objects listed with their ETag, recorded per prefix.
+        """
+        self.path = path
+        self.objects = objects
+        self.listings = listings
+
+    def list_objects_with_e_tags(self, prefix_addition: str) -> Dict[str, str]:
+        """Serve a listing of objects from the cassette."""
+        if prefix_addition not in self.listings:
+            raise NotFoundError(f"No listing of {prefix_addition} recorded in cassette {self.path}")
+
+        return dict(self.listings[prefix_addition])
+
+    def retrieve_blob(self, object_key: str) -> bytes:
+        """Serve an object from the cassette."""
+        blob = self.objects.get(object_key)
+
+        if blob is None:
+            raise NotFoundError(f"No object {object_key} recorded in cassette {self.path}")
+
+        return base64.b64decode(blob)
+
+    def store_blob(self, blob: Any, object_key: str) -> None:
+        """Refuse to store an object, replayed runs do not store anything."""
+        raise RuntimeError(f"Object {object_key} cannot be stored on Ceph when replaying cassette {self.path}")
+
+
+class CassettePlayer:
+    """Query client serving results recorded in a cassette, without any request to Prometheus/Thanos.
+
+    Requests are matched on kind, query, step, parameters and time range. Requests with a different time range
+    fall back to the results recorded for the same kind, query, step and parameters, in recording order.
+    """
+
+    def __init__(self, path: str):
+        """Initialize cassette player, loading the cassette.
+
+        @param path: path to the cassette.
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._exact: Dict[str, Deque[List[Dict[str, Any]]]] = collections.defaultdict(collections.deque)
+        self._loose: Dict[str, Deque[List[Dict[str, Any]]]] = collections.defaultdict(collections.deque)
+        self._lock = threading.Lock()
+        ceph_objects: Dict[str, Optional[str]] = {}
+        ceph_listings: Dict[str, Dict[str, str]] = {}
+
+        with gzip.open(path, "rt", encoding="utf-8") as cassette:
+            header = json.loads(cassette.readline())
+            self.recorded_at = datetime.datetime.fromisoformat(header["recorded_at"])
+
+            for line in cassette:
+                entry = json.loads(line)
+
+                if entry["kind"] == "ceph":
+                    ceph_objects[entry["object_key"]] = entry["blob"]
+                    continue
+
+                if entry["kind"] == "ceph_listing":
+                    ceph_listings[entry["prefix_addition"]] = entry["objects"]
+                    continue
+
+                time_params = self._time_params(entry)
+
+                for exact, index in [(True, self._exact), (False, self._loose)]:
+                    key = _create_key(entry["kind"], entry["query"], entry.get("step"), entry["params"], exact=exact, **time_params)
+                    index[key].append(entry["result"])
+
+        self.ceph = CassetteCephStore(path=path, objects=ceph_objects, listings=ceph_listings)
+        _LOGGER.info(f"Replaying Thanos responses and {len(ceph_objects)} Ceph objects of {self.recorded_at} from cassette {path}")
+
+    @staticmethod
+    def _time_params(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Get time parameters of a request."""
+        if entry["kind"] == "query_range":
+            return {"start": entry["start"], "end": entry["end"]}
+
+        return {"time": entry["params"].get("time")}
+
+    def _play(self, entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Serve the result recorded for a request."""
+        time_params = self._time_params(entry)
+
+        with self._lock:
+            for exact, index in [(True, self._exact), (False, self._loose)]:
+                results = index.get(_create_key(entry["kind"], entry["query"], entry.get("step"), entry["params"], exact=exact, **time_params))
+
+                if results:
+                    self.hits += 1
+                    # The last result is kept, so that repeated requests are served as well.
+                    return results.popleft() if len(results) > 1 else results[0]
+
+            self.misses += 1
+
+        raise KeyError(f"No response recorded in cassette {self.path} for {entry['kind']}: {entry['query']}")
+
+    def custom_query_range(
+        self,
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Serve a query_range from the cassette."""
+        return self._play(
+            {
+                "kind": "query_range",
+                "query": query,
+                "start": round(start_time.timestamp()),
+                "end": round(end_time.timestamp()),
+                "step": step,
+                "params": params or {},
+            },
+        )
+
+    def custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Serve an instant query from the cassette."""
+        return self._play({"kind": "query", "query": query, "params": params or {}})
+
+
+def is_replaying() -> bool:
+    """Check whether Thanos responses and Ceph objects are replayed from a cassette."""
+    return bool(_CASSETTE_FILE) and _CASSETTE_MODE == "replay"
+
+
+def open_cassette(run_time: datetime.datetime) -> datetime.datetime:
+    """Open the cassette set by THOTH_SLO_REPORTER_CASSETTE, if any, for a run.
+
+    :output: time of the run, the recorded one when replaying.
+    """
+    if not _CASSETTE_FILE:
+        return run_time
+
+    if _CASSETTE_MODE not in ("record", "replay"):
+        raise ValueError(f"Unknown cassette mode {_CASSETTE_MODE!r}, use record or replay.")
+
+    with _CASSETTES_LOCK:
+        if _CASSETTE_FILE not in _CASSETTES:
+            if _CASSETTE_MODE == "record":
+                recorder = CassetteRecorder(path=_CASSETTE_FILE, recorded_at=run_time)
+                atexit.register(recorder.close)
+                _CASSETTES[_CASSETTE_FILE] = recorder
+            else:
+                _CASSETTES[_CASSETTE_FILE] = CassettePlayer(path=_CASSETTE_FILE)
+
+        cassette = _CASSETTES[_CASSETTE_FILE]
+
+    return cassette.recorded_at if isinstance(cassette, CassettePlayer) else run_time
+
+
+def get_cassette_client(client: Any) -> Any:
+    """Get client recording in, or replaying from, the cassette set by THOTH_SLO_REPORTER_CASSETTE, client itself if none."""
+    if not _CASSETTE_FILE:
+        return client
+
+    open_cassette(run_time=datetime.datetime.utcnow())
+    cassette = _CASSETTES[_CASSETTE_FILE]
+
+    if isinstance(cassette, CassettePlayer):
+        return cassette
+
+    return cassette.wrap(client)
+
+
+def get_cassette_ceph_store(ceph: Any) -> Any:
+    """Get Ceph store recording objects read in, or serving them from, the cassette set by THOTH_SLO_REPORTER_CASSETTE, ceph itself if none."""
+    if not _CASSETTE_FILE:
+        return ceph
+
+    open_cassette(run_time=datetime.datetime.utcnow())
+    cassette = _CASSETTES[_CASSETTE_FILE]
+
+    if isinstance(cassette, CassettePlayer):
+        return cassette.ceph
+
+    return cassette.wrap_ceph(ceph)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Run-scoped cache of SLI metrics retrieved from Ceph."""
+
+import copy
+import logging
+import threading
+
+from typing import Callable, Dict, List, Tuple, Any
+
+import pandas as pd
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CephReadCache:
+    """Read-through cache of DataFrames (or other values, e.g. manifests) parsed from Ceph objects, so that each object is retrieved once per run.
+
+    Entries are keyed by bucket, prefix and object key of the Ceph store, and by the columns the object is parsed with.
+    Copies of cached values are returned, so that callers cannot alter the cached ones.
+    """
+
+    def __init__(self):
+        """Initialize Ceph read cache."""
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Tuple[Any, ...], Any] = {}
+        self._key_locks: Dict[Tuple[Any, ...], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        """Copy a cached value."""
+        return value.copy() if isinstance(value, pd.DataFrame) else copy.deepcopy(value)
+
+    @staticmethod
+    def _get_object_id(ceph_sli: Any, ceph_path: str) -> Tuple[Any, ...]:
+        """Get identifier of a Ceph object."""
+        return getattr(ceph_sli, "bucket", None), getattr(ceph_sli, "prefix", None), ceph_path
+
+    def get(
+        self,
+        ceph_sli: Any,
+        ceph_path: str,
+        total_columns: List[str],
+        retrieve: Callable[[Any, str, List[str]], Any],
+    ) -> Any:
+        """Get DataFrame (or other value) parsed from a Ceph object, retrieving it if it is not cached yet.
+
+        @param retrieve: function retrieving and parsing the object from Ceph.
+        """
+        key = (*self._get_object_id(ceph_sli, ceph_path), tuple(total_columns))
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Concurrent readers of the same object wait for the first one to retrieve it.
+        with key_lock:
+            with self._lock:
+                cached = self._entries.get(key)
+
+                if cached is not None:
+                    self.hits += 1
+                    return self._copy(cached)
+
+                self.misses += 1
+
+            retrieved = retrieve(ceph_sli, ceph_path, total_columns)
+
+            with self._lock:
+                self._entries[key] = retrieved
+
+        return self._copy(retrieved)
+
+    def invalidate(self, ceph_sli: Any, ceph_path: str) -> None:
+        """Invalidate entries of a Ceph object, e.g. once it is stored."""
+        object_id = self._get_object_id(ceph_sli, ceph_path)
+
+        with self._lock:
+            for key in [key for key in self._entries if key[:3] == object_id]:
+                del self._entries[key]
+
+    def reset(self) -> None:
+        """Drop all entries and statistics, at the start of a run."""
+        with self._lock:
+            self._entries.clear()
+            self._key_locks.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+CEPH_READ_CACHE = CephReadCache()
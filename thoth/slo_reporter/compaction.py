@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Compaction of daily SLI metrics stored on Ceph in monthly and yearly Parquet partitions.
+
+Only complete months and years are compacted. The manifest of each SLI class records the days of each compacted
+month with the ETags of their daily objects, and the months of each compacted year, so that periods already compacted
+with the same content are skipped: compaction can be run repeatedly and resumed after a failure, and months whose
+daily objects were rewritten since (e.g. by advise-reporter) are compacted again. Daily objects are kept.
+"""
+
+import logging
+import datetime
+
+from typing import Dict, List, Set
+
+import pandas as pd
+
+from thoth.storages import CephStore
+
+from thoth.slo_reporter.ceph_cache import CEPH_READ_CACHE
+from thoth.slo_reporter.sli_storage import get_sli_partition_key, list_sli_objects, serialize_sli
+from thoth.slo_reporter.sli_storage import retrieve_compaction_manifest, store_compaction_manifest
+from thoth.slo_reporter.utils import retrieve_daily_thoth_sli_from_ceph, retrieve_thoth_sli_from_ceph
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _store_partition(ceph_sli: CephStore, object_key: str, partition_df: pd.DataFrame) -> None:
+    """Store a partition."""
+    ceph_sli.store_blob(blob=serialize_sli(partition_df, object_key=object_key), object_key=object_key)
+    CEPH_READ_CACHE.invalidate(ceph_sli, object_key)
+    _LOGGER.info(f"Stored partition {object_key} with {len(partition_df)} rows")
+
+
+def compact_sli_metrics(
+    ceph_sli: CephStore,
+    sli_name: str,
+    store_columns: List[str],
+    today: datetime.date,
+    max_workers: int = 8,
+) -> Dict[str, int]:
+    """Compact daily SLI metrics of a SLI class for months and years completed before today.
+
+    :output: number of monthly and yearly partitions stored.
+    """
+    manifest = retrieve_compaction_manifest(ceph_sli, sli_name)
+    stored = {"months": 0, "years": 0}
+
+    objects_per_month: Dict[str, Dict[str, str]] = {}
+    days_per_month: Dict[str, Set[datetime.date]] = {}
+
+    for object_key, (day, e_tag) in list_sli_objects(ceph_sli, sli_name).items():
+        month = day.strftime("%Y-%m")
+
+        if month < today.strftime("%Y-%m"):
+            objects_per_month.setdefault(month, {})[object_key] = e_tag
+            days_per_month.setdefault(month, set()).add(day)
+
+    for month, objects in sorted(objects_per_month.items()):
+        if manifest["months"].get(month, {}).get("objects") == objects:
+            continue
+
+        days = sorted(days_per_month[month])
+
+        daily_dfs = retrieve_daily_thoth_sli_from_ceph(ceph_sli, sli_name, days=days, total_columns=store_columns, max_workers=max_workers)
+        retrieved_dfs = [daily_df.assign(date=str(day)) for day, daily_df in zip(days, daily_dfs) if not daily_df.empty]
+
+        if not retrieved_dfs:
+            _LOGGER.warning(f"No {sli_name} data could be retrieved for {month}, month is not compacted.")
+            continue
+
+        object_key = get_sli_partition_key(sli_name, month)
+        _store_partition(ceph_sli, object_key, pd.concat(retrieved_dfs, ignore_index=True))
+
+        manifest["months"][month] = {
+            "key": object_key,
+            "days": [str(day) for day in days],
+            "objects": objects,
+            "compacted_at": datetime.datetime.utcnow().isoformat(),
+        }
+        # The partition of the year does not contain the days just compacted anymore.
+        manifest["years"].pop(month[:4], None)
+        # The manifest is stored after each partition, so that an interrupted compaction resumes from there.
+        store_compaction_manifest(ceph_sli, sli_name, manifest)
+        stored["months"] += 1
+
+    for year in sorted({month[:4] for month in manifest["months"]}):
+        months = sorted(month for month in manifest["months"] if month.startswith(year))
+
+        if year >= str(today.year) or manifest["years"].get(year, {}).get("months") == months:
+            continue
+
+        monthly_dfs = [retrieve_thoth_sli_from_ceph(ceph_sli, manifest["months"][month]["key"], store_columns + ["date"]) for month in months]
+
+        if any(monthly_df.empty for monthly_df in monthly_dfs):
+            _LOGGER.warning(f"Not all monthly partitions of {sli_name} could be retrieved for {year}, year is not compacted.")
+            continue
+
+        object_key = get_sli_partition_key(sli_name, year)
+        _store_partition(ceph_sli, object_key, pd.concat(monthly_dfs, ignore_index=True))
+
+        manifest["years"][year] = {"key": object_key, "months": months, "compacted_at": datetime.datetime.utcnow().isoformat()}
+        store_compaction_manifest(ceph_sli, sli_name, manifest)
+        stored["years"] += 1
+
+    return stored
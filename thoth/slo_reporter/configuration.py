@@ -21,12 +21,16 @@ import logging
 import os
 import datetime
 
-from prometheus_client import CollectorRegistry, Gauge
+from prometheus_client import CollectorRegistry, Gauge, Histogram
 from thoth.common.enums import ThothAdviserIntegrationEnum
 
 from thoth.storages import CephStore
 
-from typing import Optional
+from typing import Optional, Any
+
+from thoth.slo_reporter.query_stats import QueryStats
+from thoth.slo_reporter.cassette import get_cassette_ceph_store, is_replaying
+from thoth.slo_reporter.sli_storage import get_storage_format
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -34,8 +38,18 @@ _LOGGER = logging.getLogger(__name__)
 class Configuration:
     """Configuration of SLO-reporter."""
 
-    def __init__(self, start_time: datetime.datetime, end_time: datetime.datetime, number_days: int, dry_run: bool):
-        """Initialize SLI Configuration."""
+    def __init__(
+        self,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        number_days: int,
+        dry_run: bool,
+        store_on_ceph: bool = True,
+    ):
+        """Initialize SLI Configuration.
+
+        @param store_on_ceph: whether the run stores data on Ceph (THOTH_SLO_REPORTER_STORE_ON_CEPH).
+        """
         if not start_time:
             raise Exception("Start time date has not been defined!")
 
@@ -44,6 +58,7 @@ class Configuration:
         self.last_week_time = str((self.end_time - datetime.timedelta(days=7)).strftime("%Y-%m-%d"))
         self.number_days = number_days
         self.dry_run = dry_run
+        self.store_on_ceph = store_on_ceph
 
         self.start_time_epoch = int(self.start_time.timestamp() * 1000)
         self.end_time_epoch = int(self.end_time.timestamp() * 1000)
@@ -58,7 +73,7 @@ class Configuration:
             self.instance_wc_backend = "dry_run"
             self.instance_wc_middletier = "dry_run"
             self.instance_wc_amun_inspection = "dry_run"
-            self.ceph_sli = "dry_run"
+            self.ceph_sli: Any = "dry_run"
 
         if not dry_run:
 
@@ -94,13 +109,42 @@ class Configuration:
                 registry=self.prometheus_registry,
             )
 
+            # Cost of queries executed by SLO-reporter
+            self.thoth_slo_reporter_query_duration = Histogram(
+                "thoth_slo_reporter_query_duration_seconds",
+                "Duration of queries executed by Thoth SLO-reporter",
+                ["sli_type", "query_name", "env"],
+                buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+                registry=self.prometheus_registry,
+            )
+            self.thoth_slo_reporter_query_response_bytes = Gauge(
+                "thoth_slo_reporter_query_response_bytes",
+                "Size of responses to queries executed by Thoth SLO-reporter",
+                ["sli_type", "query_name", "env"],
+                registry=self.prometheus_registry,
+            )
+            self.thoth_slo_reporter_query_samples = Gauge(
+                "thoth_slo_reporter_query_samples",
+                "Samples retrieved by queries executed by Thoth SLO-reporter",
+                ["sli_type", "query_name", "env"],
+                registry=self.prometheus_registry,
+            )
+            self.thoth_slo_reporter_query_retries = Gauge(
+                "thoth_slo_reporter_query_retries",
+                "Retries of queries executed by Thoth SLO-reporter",
+                ["sli_type", "query_name", "env"],
+                registry=self.prometheus_registry,
+            )
+
             self.thanos_url = os.environ["THANOS_ENDPOINT"]
             self.thanos_token = os.environ["THANOS_ACCESS_TOKEN"]
 
-            # Ceph
+            # Ceph, objects read are recorded in the cassette if any, and served from it when it is replayed
             self.public_ceph_bucket = os.getenv("THOTH_PUBLIC_CEPH_BUCKET")
             self.ceph_bucket_prefix = os.environ["THOTH_CEPH_BUCKET_PREFIX"]
-            self.ceph_sli = _connect_to_ceph(self.ceph_bucket_prefix, self.environment)  # type: ignore
+            self.ceph_sli = get_cassette_ceph_store(
+                None if is_replaying() else _connect_to_ceph(self.ceph_bucket_prefix, self.environment),
+            )
 
         # Grafana
         self.grafana_reference_base_url = os.getenv(
@@ -150,8 +194,68 @@ class Configuration:
         # Step for query range
         self.step = "1h"
 
+        # Cost of the queries executed during the run
+        self.query_stats = QueryStats()
+
+        # Select step of range queries from the window and a point budget, reading downsampled data on Thanos
+        self.adaptive_step = bool(int(os.getenv("THOTH_SLO_REPORTER_ADAPTIVE_STEP", 0)))
+        self.query_point_budget = int(os.getenv("THOTH_SLO_REPORTER_QUERY_POINT_BUDGET", 250))
+        self.query_min_step = os.getenv("THOTH_SLO_REPORTER_QUERY_MIN_STEP", "1m")
+
+        # Maximum number of queries executed concurrently against Prometheus/Thanos
+        self.query_concurrency = int(os.getenv("THOTH_SLO_REPORTER_QUERY_CONCURRENCY", 1))
+
+        # Client used to query Prometheus/Thanos: requests (PrometheusConnect) or aiohttp (AsyncThanosClient)
+        self.thanos_client = os.getenv("THOTH_SLO_REPORTER_THANOS_CLIENT", "requests")
+        # Seconds after which a request to Prometheus/Thanos is cancelled, so that hung requests do not hold workers
+        self.query_timeout = int(os.getenv("THOTH_SLO_REPORTER_QUERY_TIMEOUT", 300))
+
+        # Execution policy of queries, SLI classes may override it (see SLIBase.query_policy)
+        # Seconds after which a query and its retries are abandoned (no deadline if 0)
+        self.query_deadline = float(os.getenv("THOTH_SLO_REPORTER_QUERY_DEADLINE", 0))
+        # Retries of a query on connection errors, 429 and 5xx responses (no retries if 0)
+        self.query_max_retries = int(os.getenv("THOTH_SLO_REPORTER_QUERY_MAX_RETRIES", 0))
+        # Seconds waited before the first retry, doubled at each retry up to the maximum (with full jitter)
+        self.query_backoff = float(os.getenv("THOTH_SLO_REPORTER_QUERY_BACKOFF", 1))
+        self.query_backoff_max = float(os.getenv("THOTH_SLO_REPORTER_QUERY_BACKOFF_MAX", 30))
+        # Retries allowed to all queries of a run
+        self.query_retry_budget = int(os.getenv("THOTH_SLO_REPORTER_QUERY_RETRY_BUDGET", 20))
+        # Percentile of latencies observed during the run after which a hedged request is sent (no hedging if 0)
+        self.query_hedge_percentile = float(os.getenv("THOTH_SLO_REPORTER_QUERY_HEDGE_PERCENTILE", 0))
+
+        # Fail remaining queries fast once a number of requests failed in a row (disabled if 0),
+        # probing Prometheus/Thanos again after the cooldown (in seconds)
+        self.query_circuit_breaker_threshold = int(os.getenv("THOTH_SLO_REPORTER_QUERY_CIRCUIT_BREAKER_THRESHOLD", 0))
+        self.query_circuit_breaker_cooldown = float(os.getenv("THOTH_SLO_REPORTER_QUERY_CIRCUIT_BREAKER_COOLDOWN", 60))
+
+        # Metrics that cannot be retrieved are reported with their last known good value, flagged as stale.
+        # Values are stored in this local JSON file if set, on Ceph otherwise (if metrics are stored on Ceph)
+        self.last_known_good_file = os.getenv("THOTH_SLO_REPORTER_LAST_KNOWN_GOOD_FILE")
+
+        # Reduce range queries server-side (e.g. last_over_time) with one instant query when possible
+        self.server_side_reduction = bool(int(os.getenv("THOTH_SLO_REPORTER_SERVER_SIDE_REDUCTION", 0)))
+
+        # On-disk cache of query results (disabled if directory is not set)
+        self.query_cache_dir = os.getenv("THOTH_SLO_REPORTER_QUERY_CACHE_DIR")
+        self.query_cache_ttl = int(os.getenv("THOTH_SLO_REPORTER_QUERY_CACHE_TTL", 24 * 3600))
+        self.query_cache_max_size = int(os.getenv("THOTH_SLO_REPORTER_QUERY_CACHE_MAX_SIZE", 512 * 1024 * 1024))
+
+        # Range queries are split in chunks (fetched in parallel) longer than the chunk size (e.g. 7d),
+        # if set, or than the maximum number of points per series allowed by the server
+        self.query_range_chunk = os.getenv("THOTH_SLO_REPORTER_QUERY_RANGE_CHUNK")
+        self.query_range_max_points = int(os.getenv("THOTH_SLO_REPORTER_QUERY_RANGE_MAX_POINTS", 11000))
+        self.query_range_chunk_concurrency = int(os.getenv("THOTH_SLO_REPORTER_QUERY_RANGE_CHUNK_CONCURRENCY", 4))
+
         # Period considered for adviser inputs analysis (in days)
         self.adviser_inputs_analysis_days = 7
+        # Maximum number of daily objects retrieved concurrently from Ceph
+        self.ceph_concurrency = int(os.getenv("THOTH_SLO_REPORTER_CEPH_CONCURRENCY", 8))
+        # Format of SLI metrics stored on Ceph, checked here so that a misconfigured run fails before querying
+        self.storage_format = get_storage_format()
+        # Maintain totals of adviser inputs over the analyzed days incrementally on Ceph, instead of retrieving all days
+        self.rolling_aggregates = bool(int(os.getenv("THOTH_SLO_REPORTER_ROLLING_AGGREGATES", 0)))
+        # Rolling aggregates are only read if metrics are not stored on Ceph, in dry runs and in replayed runs
+        self.store_rolling_aggregates = store_on_ceph and not dry_run and not is_replaying()
 
         # Service Interval for report
         self.interval = os.getenv("SERVICE_INTERVAL", "7d")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Last known good value of each metric, used in reports when a metric cannot be retrieved from Prometheus/Thanos."""
+
+import json
+import logging
+import datetime
+
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Any
+
+from thoth.storages import CephStore
+
+_LOGGER = logging.getLogger(__name__)
+
+# Object key of last known good values on Ceph, relative to the prefix of SLI metrics.
+LAST_KNOWN_GOOD_CEPH_PATH = "last-known-good.json"
+
+
+class LastKnownGoodStore:
+    """Store of the last value successfully retrieved for each metric, either in a local JSON file or on Ceph.
+
+    Values are stored per SLI class and metric name, with the end time of the run they were retrieved for.
+    """
+
+    def __init__(self, path: Optional[str] = None, ceph_sli: Optional[CephStore] = None):
+        """Initialize last known good store, loading stored values.
+
+        @param path: path to the local JSON file, used instead of Ceph if set.
+        @param ceph_sli: Ceph store of SLI metrics.
+        """
+        self.path = path
+        self.ceph_sli = ceph_sli
+        self.values: Dict[str, Dict[str, Dict[str, Any]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """Load stored values, none if they cannot be retrieved."""
+        try:
+            if self.path:
+                if not Path(self.path).exists():
+                    return {}
+
+                return json.loads(Path(self.path).read_text())  # type: ignore
+
+            if self.ceph_sli is not None:
+                return json.loads(self.ceph_sli.retrieve_blob(object_key=LAST_KNOWN_GOOD_CEPH_PATH).decode("utf-8"))  # type: ignore
+
+        except Exception as e:
+            _LOGGER.warning(f"No last known good values could be retrieved: {e}")
+
+        return {}
+
+    def _save(self) -> None:
+        """Store values."""
+        content = json.dumps(self.values, sort_keys=True)
+
+        if self.path:
+            Path(self.path).write_text(content)
+        elif self.ceph_sli is not None:
+            self.ceph_sli.store_blob(blob=content.encode("utf-8"), object_key=LAST_KNOWN_GOOD_CEPH_PATH)
+
+    def update(self, sli_metrics: Dict[str, Dict[str, Any]], end_time: datetime.datetime) -> None:
+        """Update stored values with the metrics retrieved for a run, keeping values of more recent runs."""
+        for sli_name, metric_data in sli_metrics.items():
+            sli_values = self.values.setdefault(sli_name, {})
+
+            for metric_name, value in metric_data.items():
+                stored = sli_values.get(metric_name)
+
+                if value == "ErrorMetricRetrieval" or (stored and stored["end_time"] > end_time.isoformat()):
+                    continue
+
+                sli_values[metric_name] = {"value": value, "end_time": end_time.isoformat()}
+
+        try:
+            self._save()
+        except Exception as e:
+            _LOGGER.exception(f"Could not store last known good values...{e}")
+
+    def fill(self, sli_metrics: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, str]]]:
+        """Fill metrics that could not be retrieved with their last known good value.
+
+        :output: metrics with stale values filled in, and end time of the run of each stale value per SLI class.
+        """
+        filled_metrics: Dict[str, Dict[str, Any]] = {}
+        stale_metrics: Dict[str, Dict[str, str]] = {}
+
+        for sli_name, metric_data in sli_metrics.items():
+            filled_metrics[sli_name] = dict(metric_data)
+
+            for metric_name, value in metric_data.items():
+                stored = self.values.get(sli_name, {}).get(metric_name)
+
+                if value != "ErrorMetricRetrieval" or stored is None:
+                    continue
+
+                filled_metrics[sli_name][metric_name] = stored["value"]
+                stale_metrics.setdefault(sli_name, {})[metric_name] = stored["end_time"]
+
+        return filled_metrics, stale_metrics
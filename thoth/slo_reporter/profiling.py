@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Profiling mode of SLO-reporter runs: CPU (cProfile or sampling) and memory (tracemalloc)."""
+
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+import tracemalloc
+import collections
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Any
+
+_LOGGER = logging.getLogger(__name__)
+
+# Profiler used for the run: cprofile or sampling, profiling is disabled if not set.
+_PROFILE = os.getenv("THOTH_SLO_REPORTER_PROFILE")
+_PROFILE_DIR = os.getenv("THOTH_SLO_REPORTER_PROFILE_DIR", str(Path.cwd().joinpath("thoth", "slo_reporter")))
+_PROFILE_INTERVAL = float(os.getenv("THOTH_SLO_REPORTER_PROFILE_INTERVAL", 0.01))
+_PROFILE_TOP_ALLOCATIONS = int(os.getenv("THOTH_SLO_REPORTER_PROFILE_TOP_ALLOCATIONS", 25))
+_PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("THOTH_SLO_REPORTER_PROFILE_TRACEMALLOC_FRAMES", 10))
+
+
+class SamplingProfiler:
+    """Sample stacks of all threads at a fixed interval, aggregated as collapsed stacks for flamegraphs."""
+
+    def __init__(self, interval: float):
+        """Initialize sampling profiler.
+
+        @param interval: seconds between samples.
+        """
+        self.interval = interval
+        self.stacks: Dict[str, int] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+
+    def _sample(self) -> None:
+        """Sample stacks until stopped."""
+        thread_names = {}
+
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                thread_names[thread.ident] = thread.name
+
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self._thread.ident:
+                    continue
+
+                stack: List[str] = []
+
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})".replace(";", ":"))
+                    frame = frame.f_back  # type: ignore
+
+                stack.append(thread_names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1  # type: ignore
+
+    def start(self) -> None:
+        """Start sampling."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stop.set()
+        self._thread.join()
+
+    def write_collapsed_stacks(self, path: Path) -> None:
+        """Write samples in collapsed stack format (e.g. for flamegraph.pl or speedscope)."""
+        with open(path, "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class ThreadsProfiler:
+    """Profile the thread starting it and all threads started afterwards (e.g. workers of thread pools) with cProfile.
+
+    cProfile profiles only the thread enabling it, so a profiler is enabled in each thread and their statistics are merged.
+    """
+
+    def __init__(self):
+        """Initialize threads profiler."""
+        self.profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _profile_thread(self, *args: Any) -> None:
+        """Enable a profiler in the current thread, replacing this profile function on the first event of a new thread."""
+        profiler = cProfile.Profile()
+
+        with self._lock:
+            self.profilers.append(profiler)
+
+        profiler.enable()
+
+    def start(self) -> None:
+        """Start profiling."""
+        threading.setprofile(self._profile_thread)
+        self._profile_thread()
+
+    def stop(self) -> None:
+        """Stop profiling."""
+        threading.setprofile(None)  # type: ignore
+
+        with self._lock:
+            for profiler in self.profilers:
+                profiler.disable()
+
+    def write_stats(self, path: Path) -> None:
+        """Write statistics of all threads merged, in pstats format (e.g. for snakeviz)."""
+        with self._lock:
+            pstats.Stats(*self.profilers).dump_stats(path)
+
+
+class AllocationTracker:
+    """Track memory allocations with tracemalloc, keeping a snapshot taken close to the peak of traced memory."""
+
+    def __init__(self, frames: int, interval: float = 1.0):
+        """Initialize allocation tracker.
+
+        @param frames: frames stored for each allocation traceback.
+        @param interval: seconds between checks of traced memory, to snapshot it when it reaches a new peak.
+        """
+        self.frames = frames
+        self.interval = interval
+        self.peak_snapshot: Optional[tracemalloc.Snapshot] = None
+        self.peak_snapshot_size = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch_peak, name="allocation-tracker", daemon=True)
+
+    def _watch_peak(self) -> None:
+        """Snapshot traced memory each time it grows 10% above the last snapshot taken."""
+        while not self._stop.wait(self.interval):
+            current, _ = tracemalloc.get_traced_memory()
+
+            if current > self.peak_snapshot_size * 1.1:
+                self.peak_snapshot = tracemalloc.take_snapshot()
+                self.peak_snapshot_size = current
+
+    def start(self) -> None:
+        """Start tracing allocations."""
+        tracemalloc.start(self.frames)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop tracing allocations."""
+        self._stop.set()
+        self._thread.join()
+        tracemalloc.stop()
+
+    def write_summary(self, path: Path, top: int, final_snapshot: tracemalloc.Snapshot, peak: int) -> None:
+        """Write top allocations at the peak of traced memory and at the end of the run."""
+        with open(path, "w") as f:
+            f.write(f"Peak traced memory: {peak / 2**20:.1f} MiB\n")
+
+            for title, snapshot in [
+                (f"Top {top} allocations close to peak ({self.peak_snapshot_size / 2**20:.1f} MiB traced)", self.peak_snapshot),
+                (f"Top {top} allocations at the end of the run", final_snapshot),
+            ]:
+                if snapshot is None:
+                    continue
+
+                f.write(f"\n{title}\n")
+
+                for statistic in snapshot.statistics("traceback")[:top]:
+                    f.write(f"\n{statistic.size / 2**20:.1f} MiB in {statistic.count} blocks\n")
+                    f.write("\n".join(statistic.traceback.format(most_recent_first=True)) + "\n")
+
+
+def profiled(function: Callable[..., Any]) -> Callable[..., Any]:
+    """Run function under the profilers selected by THOTH_SLO_REPORTER_PROFILE, writing their results in the profile directory."""
+    if not _PROFILE:
+        return function
+
+    if _PROFILE not in ("cprofile", "sampling"):
+        raise ValueError(f"Unknown profiler {_PROFILE!r}, use cprofile or sampling.")
+
+    @functools.wraps(function)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        output_dir = Path(_PROFILE_DIR)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        allocation_tracker = AllocationTracker(frames=_PROFILE_TRACEMALLOC_FRAMES)
+        profiler: Any = ThreadsProfiler() if _PROFILE == "cprofile" else SamplingProfiler(interval=_PROFILE_INTERVAL)
+
+        _LOGGER.info(f"Profiling run with {_PROFILE} and tracemalloc, results stored in {output_dir}")
+        start = time.perf_counter()
+        allocation_tracker.start()
+        profiler.start()
+
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.stop()
+
+            if isinstance(profiler, ThreadsProfiler):
+                profiler.write_stats(output_dir.joinpath("SLO-reporter.pstats"))
+            else:
+                profiler.write_collapsed_stacks(output_dir.joinpath("SLO-reporter.collapsed"))
+
+            final_snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            allocation_tracker.stop()
+            allocation_tracker.write_summary(
+                output_dir.joinpath("SLO-reporter-allocations.txt"),
+                top=_PROFILE_TOP_ALLOCATIONS,
+                final_snapshot=final_snapshot,
+                peak=peak,
+            )
+
+            _LOGGER.info(f"Profiled run took {time.perf_counter() - start:.1f}s, peak traced memory {peak / 2**20:.1f} MiB")
+
+    return wrapper
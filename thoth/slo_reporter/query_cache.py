@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Caches of query results retrieved from Prometheus/Thanos."""
+
+import os
+import json
+import time
+import logging
+import hashlib
+import datetime
+import tempfile
+import threading
+
+from pathlib import Path
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Any
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class QueryCache:
+    """Directory of query results with TTL and size-based LRU eviction."""
+
+    def __init__(self, cache_dir: str, ttl: int, max_size: int):
+        """Initialize query cache.
+
+        @param cache_dir: directory where query results are stored.
+        @param ttl: seconds after which a stored query result expires.
+        @param max_size: maximum size in bytes of the stored query results.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _create_key(query: str, start: Optional[int], end: Optional[int], step: Optional[str], params: Dict[str, Any]) -> str:
+        """Create key of a query result."""
+        key = json.dumps([query, start, end, step, params], sort_keys=True)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(
+        self,
+        query: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        step: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Get a stored query result, None if it is missing or expired."""
+        cache_path = self.cache_dir.joinpath(f"{self._create_key(query, start, end, step, params or {})}.json")
+
+        try:
+            with open(cache_path, "r") as cache_file:
+                cached_result = json.load(cache_file)
+
+            if time.time() - cached_result["stored_at"] > self.ttl:
+                _LOGGER.debug(f"Query cache entry expired... {cache_path.name}")
+                cache_path.unlink()
+                cached_result = None
+            else:
+                # Modification time tracks the last use of an entry for LRU eviction.
+                os.utime(cache_path)
+
+        except (OSError, ValueError, KeyError):
+            cached_result = None
+
+        with self._lock:
+            if cached_result is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        return cached_result["metric_data"]  # type: ignore
+
+    def set(
+        self,
+        query: str,
+        metric_data: List[Dict[str, Any]],
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        step: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Store a query result, evicting least recently used entries above maximum size."""
+        cache_path = self.cache_dir.joinpath(f"{self._create_key(query, start, end, step, params or {})}.json")
+
+        with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False) as cache_file:
+            json.dump({"stored_at": time.time(), "query": query, "metric_data": metric_data}, cache_file)
+
+        os.replace(cache_file.name, cache_path)
+
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Evict least recently used entries until the cache fits its maximum size."""
+        entries = []
+        total_size = 0
+
+        for cache_path in self.cache_dir.glob("*.json"):
+            try:
+                stat = cache_path.stat()
+            except OSError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, cache_path))
+            total_size += stat.st_size
+
+        for _, size, cache_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+
+            _LOGGER.debug(f"Evicting query cache entry... {cache_path.name}")
+            cache_path.unlink(missing_ok=True)
+            total_size -= size
+
+
+class CachedQueryClient:
+    """Query client serving Prometheus/Thanos query results from a query cache.
+
+    Query results are looked up by time range boundaries (and evaluation time of instant queries) aligned down to
+    the resolution, so that runs within the same resolution interval share the same query results. Queries are sent
+    with the exact time range requested, so that the window is not shrunk. Empty results are not cached, as they may
+    be transient.
+    """
+
+    def __init__(self, client: Any, cache: QueryCache, resolution: int):
+        """Initialize cached query client.
+
+        @param client: client used on cache misses (e.g. PrometheusConnect).
+        @param cache: query cache.
+        @param resolution: seconds to which time range boundaries of cached results are aligned.
+        """
+        self.client = client
+        self.cache = cache
+        self.resolution = resolution
+
+    def _align(self, timestamp: float) -> int:
+        """Align timestamp down to the resolution."""
+        return int(timestamp // self.resolution * self.resolution)
+
+    def custom_query_range(
+        self,
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Send a query_range, served from the cache when possible."""
+        params = params or {}
+        start = self._align(start_time.timestamp())
+        end = self._align(end_time.timestamp())
+
+        metric_data = self.cache.get(query=query, start=start, end=end, step=step, params=params)
+
+        if metric_data is None:
+            metric_data = self.client.custom_query_range(query=query, start_time=start_time, end_time=end_time, step=step, params=params)
+
+            if metric_data:
+                self.cache.set(query=query, metric_data=metric_data, start=start, end=end, step=step, params=params)
+
+        return metric_data
+
+    def custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Send an instant query, served from the cache when possible."""
+        params = params or {}
+        cache_params = {**params, "time": self._align(float(params.get("time", time.time())))}
+
+        metric_data = self.cache.get(query=query, params=cache_params)
+
+        if metric_data is None:
+            metric_data = self.client.custom_query(query=query, params=params)
+
+            if metric_data:
+                self.cache.set(query=query, metric_data=metric_data, params=cache_params)
+
+        return metric_data
+
+
+class SharedQueryClient:
+    """Query client executing identical queries once and sharing their results with every consumer.
+
+    Consumers requesting a query already in flight wait for its result instead of requesting it again.
+    """
+
+    def __init__(self, client: Any):
+        """Initialize shared query client.
+
+        @param client: client executing unique queries (e.g. PrometheusConnect).
+        """
+        self.client = client
+
+        self.requests = 0
+        self.shared = 0
+        self._results: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _execute_once(self, key: List[Any], execute: Callable[[], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Execute a query unless an identical one was already executed, returning the shared result."""
+        result_key = json.dumps(key, sort_keys=True, default=str)
+
+        with self._lock:
+            future = self._results.get(result_key)
+            is_owner = future is None
+
+            if is_owner:
+                future = Future()
+                self._results[result_key] = future
+                self.requests += 1
+            else:
+                self.shared += 1
+
+        if is_owner:
+            try:
+                future.set_result(execute())  # type: ignore
+            except Exception as e:
+                future.set_exception(e)  # type: ignore
+
+        return future.result()  # type: ignore
+
+    def custom_query_range(
+        self,
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Send a query_range, unless an identical one was already sent."""
+        return self._execute_once(
+            key=["query_range", query, round(start_time.timestamp()), round(end_time.timestamp()), step, params or {}],
+            execute=lambda: self.client.custom_query_range(
+                query=query,
+                start_time=start_time,
+                end_time=end_time,
+                step=step,
+                params=params,
+            ),
+        )
+
+    def custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Send an instant query, unless an identical one was already sent."""
+        return self._execute_once(
+            key=["query", query, params or {}],
+            execute=lambda: self.client.custom_query(query=query, params=params),
+        )
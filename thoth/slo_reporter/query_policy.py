@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Execution policy of queries sent to Prometheus/Thanos: deadlines, retries with backoff, hedged requests and circuit breaker."""
+
+import re
+import time
+import random
+import logging
+import datetime
+import functools
+import threading
+import contextvars
+import collections
+
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple, TypedDict, TypeVar, Any
+
+import numpy as np
+
+from prometheus_api_client import PrometheusApiClientException
+
+from thoth.slo_reporter.query_stats import record_retry
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Policy of the query being executed and its deadline, requests sent on its behalf follow this policy.
+_CURRENT_POLICY: contextvars.ContextVar[Optional[Tuple["QueryPolicy", Optional[float]]]] = contextvars.ContextVar(
+    "current_query_policy",
+    default=None,
+)
+
+
+class QueryDeadlineExceeded(Exception):
+    """A query did not complete within its deadline."""
+
+
+class CircuitOpenError(Exception):
+    """Requests are not sent, as Prometheus/Thanos failed too many requests in a row."""
+
+
+class CircuitBreaker:
+    """Fail requests fast once Prometheus/Thanos failed a number of requests in a row.
+
+    Once open, a single probe request is let through every cooldown, the circuit closes again if it succeeds.
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        """Initialize circuit breaker.
+
+        @param threshold: consecutive failed requests opening the circuit.
+        @param cooldown: seconds after which a probe request is let through an open circuit.
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.trips = 0
+        self.rejected = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        """Check whether the circuit is open."""
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Check whether a request can be sent."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            if not self._probing and time.monotonic() - self._opened_at >= self.cooldown:
+                self._probing = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful request, closing the circuit."""
+        with self._lock:
+            if self._opened_at is not None:
+                _LOGGER.info("Prometheus/Thanos answered the probe request, closing circuit breaker.")
+
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Record a failed request, opening the circuit after threshold consecutive failures."""
+        with self._lock:
+            self.failures += 1
+
+            if self._probing or (self._opened_at is None and self.failures >= self.threshold):
+                if self._opened_at is None:
+                    self.trips += 1
+                    _LOGGER.warning(f"{self.failures} requests to Prometheus/Thanos failed in a row, opening circuit breaker.")
+
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class RetryBudget:
+    """Retries allowed to all queries of a run, so that an unavailable Thanos does not multiply the run time."""
+
+    def __init__(self, retries: int):
+        """Initialize retry budget.
+
+        @param retries: retries allowed during the run.
+        """
+        self.retries = retries
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Acquire a retry, if any is left."""
+        with self._lock:
+            if self.spent >= self.retries:
+                return False
+
+            self.spent += 1
+            return True
+
+
+class LatencyTracker:
+    """Latencies of the last successful requests of a run."""
+
+    def __init__(self, size: int = 1000, min_samples: int = 5):
+        """Initialize latency tracker.
+
+        @param size: latencies kept.
+        @param min_samples: latencies required to evaluate a percentile.
+        """
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Record latency of a successful request."""
+        with self._lock:
+            self._latencies.append(latency)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Evaluate a percentile of the latencies, None if too few latencies were recorded."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+
+            return float(np.percentile(self._latencies, percentile))
+
+
+def is_retryable(error: Exception) -> bool:
+    """Check whether a failed request may succeed if retried (connection errors, timeouts, 429 and 5xx responses)."""
+    if isinstance(error, PrometheusApiClientException):
+        status = re.match(r"HTTP Status Code (\d+)", str(error))
+        return status is not None and (int(status.group(1)) == 429 or int(status.group(1)) >= 500)
+
+    # Connection errors and timeouts of requests and AsyncThanosClient are OSError.
+    return isinstance(error, OSError)
+
+
+class QueryPolicyOverrides(TypedDict, total=False):
+    """Overrides of the query policy of the configuration for queries of a SLI class (see QueryPolicy)."""
+
+    deadline: Optional[float]
+    max_retries: int
+    backoff: float
+    backoff_max: float
+    hedge_percentile: Optional[float]
+
+
+class QueryPolicy:
+    """Execute requests with a deadline, retries with exponential backoff and full jitter, and hedging.
+
+    A hedged request is a duplicate of a request still running after the given percentile of the latencies
+    observed during the run, the result of the first of them completing successfully is used.
+    """
+
+    def __init__(
+        self,
+        executor: Executor,
+        retry_budget: RetryBudget,
+        latency_tracker: LatencyTracker,
+        deadline: Optional[float] = None,
+        max_retries: int = 0,
+        backoff: float = 1.0,
+        backoff_max: float = 30.0,
+        hedge_percentile: Optional[float] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        """Initialize query policy.
+
+        @param executor: executor running requests with a deadline or hedged, shared by the policies of a run.
+        @param retry_budget: retries allowed to the run, shared by the policies of a run.
+        @param latency_tracker: latencies observed during the run, shared by the policies of a run.
+        @param deadline: seconds after which a query (including its retries) is abandoned.
+        @param max_retries: retries of a query.
+        @param backoff: seconds waited before the first retry, doubled at each retry.
+        @param backoff_max: maximum seconds waited before a retry.
+        @param hedge_percentile: percentile of latencies after which a hedged request is sent, no hedging if None.
+        @param circuit_breaker: circuit breaker shared by the policies of a run, if any.
+        """
+        self.executor = executor
+        self.retry_budget = retry_budget
+        self.latency_tracker = latency_tracker
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.circuit_breaker = circuit_breaker
+
+        self.hedged = 0
+        self._lock = threading.Lock()
+
+    def execute(self, request: Callable[[], T], deadline: Optional[float] = None) -> T:
+        """Execute a request following the policy.
+
+        @param deadline: monotonic time after which the request is abandoned, the deadline of the policy from now if None.
+        """
+        if deadline is None and self.deadline:
+            deadline = time.monotonic() + self.deadline
+
+        attempt = 0
+
+        while True:
+            if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+                raise CircuitOpenError("Circuit breaker is open, Prometheus/Thanos failed too many requests in a row.")
+
+            try:
+                result = self._execute_attempt(request, deadline=deadline)
+
+            except Exception as e:
+                # Other errors (e.g. invalid queries) are answered by Prometheus/Thanos, so they do not open the circuit.
+                if self.circuit_breaker is not None and (is_retryable(e) or isinstance(e, QueryDeadlineExceeded)):
+                    self.circuit_breaker.record_failure()
+                elif self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+
+                delay = random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+
+                if not self.retry_budget.acquire():
+                    _LOGGER.warning("Retry budget of the run exhausted, query is not retried.")
+                    raise
+
+                attempt += 1
+                record_retry()
+                _LOGGER.warning(f"Retrying query in {delay:.1f}s (retry {attempt}/{self.max_retries})...{e}")
+                time.sleep(delay)
+                continue
+
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+
+            return result
+
+    def _execute_attempt(self, request: Callable[[], T], deadline: Optional[float]) -> T:
+        """Execute an attempt of a request, hedged and within the deadline if required."""
+        hedge_delay = self.latency_tracker.percentile(self.hedge_percentile) if self.hedge_percentile else None
+
+        if deadline is None and hedge_delay is None:
+            return self._timed(request)
+
+        pending: Set[Future] = {self._submit(request)}
+        is_hedged = hedge_delay is None
+        error: Optional[Exception] = None
+
+        while pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+
+            if remaining is not None and remaining <= 0:
+                break
+
+            timeout = remaining
+
+            if not is_hedged:
+                timeout = hedge_delay if remaining is None else min(remaining, hedge_delay)  # type: ignore
+
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    return future.result()  # type: ignore
+
+                error = future.exception()  # type: ignore
+
+            if not done:
+                if is_hedged or (deadline is not None and time.monotonic() >= deadline):
+                    break
+
+                _LOGGER.info(f"Query still running after {hedge_delay:.2f}s, sending hedged request...")
+                pending.add(self._submit(request))
+                is_hedged = True
+
+                with self._lock:
+                    self.hedged += 1
+
+        if error is not None and not pending:
+            raise error
+
+        # Requests still running are abandoned, their results are discarded.
+        raise QueryDeadlineExceeded(f"Query did not complete within its deadline of {self.deadline}s")
+
+    def _submit(self, request: Callable[[], T]) -> Future:
+        """Submit request to the executor, in the context of the query it belongs to."""
+        return self.executor.submit(contextvars.copy_context().run, self._timed, request)
+
+    def _timed(self, request: Callable[[], T]) -> T:
+        """Execute request, recording its latency if successful."""
+        start = time.monotonic()
+        result = request()
+        self.latency_tracker.record(time.monotonic() - start)
+        return result
+
+
+def run_with_policy(policy: Optional[QueryPolicy], function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run function executing a query, whose requests follow policy (see PolicyQueryClient)."""
+    deadline = time.monotonic() + policy.deadline if policy is not None and policy.deadline else None
+    token = _CURRENT_POLICY.set((policy, deadline) if policy is not None else None)
+
+    try:
+        return function(*args, **kwargs)
+    finally:
+        _CURRENT_POLICY.reset(token)
+
+
+class PolicyQueryClient:
+    """Query client sending requests of the wrapped client (e.g. PrometheusConnect) following the policy of the current query.
+
+    It wraps the client of Prometheus/Thanos directly, so that each request (e.g. a chunk of a range query) is retried
+    or hedged on its own and hedged requests are not coalesced with the original one by SharedQueryClient.
+    """
+
+    def __init__(self, client: Any):
+        """Initialize policy query client."""
+        self.client = client
+
+    def _execute(self, request: Callable[[], T]) -> T:
+        """Execute request following the policy of the current query, if any."""
+        current = _CURRENT_POLICY.get()
+
+        if current is None:
+            return request()
+
+        policy, deadline = current
+        return policy.execute(request, deadline=deadline)
+
+    def custom_query_range(
+        self,
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Send a query_range following the policy of the current query."""
+        return self._execute(
+            functools.partial(self.client.custom_query_range, query=query, start_time=start_time, end_time=end_time, step=step, params=params),
+        )
+
+    def custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Send an instant query following the policy of the current query."""
+        return self._execute(functools.partial(self.client.custom_query, query=query, params=params))
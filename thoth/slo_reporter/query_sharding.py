@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Sharding of long range queries sent to Prometheus/Thanos."""
+
+import json
+import contextvars
+import logging
+import datetime
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Any
+
+from thoth.slo_reporter.utils import parse_duration
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ShardedQueryClient:
+    """Query client splitting long range queries in time chunks fetched in parallel and stitched together."""
+
+    def __init__(self, client: Any, max_points: int, chunk_duration: Optional[int] = None, max_workers: int = 1):
+        """Initialize sharded query client.
+
+        @param client: client executing chunk queries (e.g. PrometheusConnect).
+        @param max_points: maximum number of points per series allowed by the server for a range query.
+        @param chunk_duration: maximum seconds covered by a chunk, in addition to the maximum number of points.
+        @param max_workers: number of chunks fetched in parallel for a range query.
+        """
+        self.client = client
+        self.max_points = max_points
+        self.chunk_duration = chunk_duration
+        self.max_workers = max_workers
+
+    def _split_range(self, start: int, end: int, step: int) -> List[Tuple[int, int]]:
+        """Split a time range in chunks evaluated at the same timestamps as the whole range."""
+        chunk = self.max_points * step
+
+        if self.chunk_duration:
+            chunk = min(chunk, self.chunk_duration)
+
+        # Chunks are made of whole steps, so that chunk timestamps line up with the ones of the whole range.
+        chunk = max(chunk // step, 1) * step
+
+        if end - start < chunk:
+            return [(start, end)]
+
+        chunks = []
+        chunk_start = start
+
+        while chunk_start <= end:
+            chunks.append((chunk_start, min(chunk_start + chunk - step, end)))
+            chunk_start += chunk
+
+        return chunks
+
+    def custom_query_range(
+        self,
+        query: str,
+        start_time: datetime.datetime,
+        end_time: datetime.datetime,
+        step: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Send a query_range, split in chunks if the range is too long."""
+        chunks = self._split_range(start=round(start_time.timestamp()), end=round(end_time.timestamp()), step=parse_duration(step))
+
+        if len(chunks) == 1:
+            return self.client.custom_query_range(query=query, start_time=start_time, end_time=end_time, step=step, params=params)
+
+        _LOGGER.info(f"Splitting range query in {len(chunks)} chunks... {query}")
+
+        # Chunks run in the context of the query they belong to (e.g. to account their cost to it).
+        contexts = [contextvars.copy_context() for _ in chunks]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            chunks_metric_data = executor.map(
+                lambda chunk, context: context.run(
+                    self.client.custom_query_range,
+                    query=query,
+                    # Naive datetimes, as PrometheusConnect converts them back with timestamp().
+                    start_time=datetime.datetime.fromtimestamp(chunk[0]),
+                    end_time=datetime.datetime.fromtimestamp(chunk[1]),
+                    step=step,
+                    params=params,
+                ),
+                chunks,
+                contexts,
+            )
+
+            return stitch_metric_data(list(chunks_metric_data))
+
+    def custom_query(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Send an instant query."""
+        return self.client.custom_query(query=query, params=params)
+
+
+def stitch_metric_data(chunks_metric_data: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Stitch series retrieved by chunks of a range query into one ordered vector per series."""
+    stitched_series: Dict[str, Dict[str, Any]] = {}
+
+    for metric_data in chunks_metric_data:
+        for metric_series in metric_data:
+            series_key = json.dumps(metric_series["metric"], sort_keys=True)
+
+            if series_key not in stitched_series:
+                stitched_series[series_key] = {"metric": metric_series["metric"], "values": {}}
+
+            for value in metric_series["values"]:
+                stitched_series[series_key]["values"][float(value[0])] = value
+
+    return [
+        {"metric": metric_series["metric"], "values": [metric_series["values"][t] for t in sorted(metric_series["values"])]}
+        for metric_series in stitched_series.values()
+    ]
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Instrumentation of the cost of queries sent to Prometheus/Thanos."""
+
+import time
+import logging
+import threading
+import contextvars
+
+from typing import Callable, Dict, List, Optional, Any
+
+from thoth.slo_reporter.tracing import TRACER
+
+_LOGGER = logging.getLogger(__name__)
+
+# Record of the query being executed, HTTP requests sent on its behalf are accounted to it.
+_CURRENT_QUERY: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("current_query", default=None)
+_RECORD_LOCK = threading.Lock()
+
+
+class QueryStats:
+    """Wall time, response bytes, samples and retries of each query executed during a run."""
+
+    def __init__(self):
+        """Initialize query stats."""
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def execute(self, execute_query: Callable[..., Any], sli_name: str, query_name: str, **kwargs: Any) -> Any:
+        """Execute a query, recording its cost."""
+        record = {
+            "sli_name": sli_name,
+            "query_name": query_name,
+            "duration": 0.0,
+            "requests": 0,
+            "response_bytes": 0,
+            "samples": 0,
+            "retries": 0,
+        }
+        token = _CURRENT_QUERY.set(record)
+        start = time.perf_counter()
+
+        try:
+            with TRACER.span(f"{sli_name}.{query_name}", category="query"):
+                return execute_query(sli_name=sli_name, query_name=query_name, **kwargs)
+        finally:
+            record["duration"] = time.perf_counter() - start
+            _CURRENT_QUERY.reset(token)
+
+            with self._lock:
+                self.records.append(record)
+
+    def log_summary(self, top: int = 5) -> None:
+        """Log total cost of the queries and the slowest ones."""
+        if not self.records:
+            return
+
+        _LOGGER.info(
+            f"Executed {len(self.records)} queries: {sum(r['requests'] for r in self.records)} requests, "
+            f"{sum(r['response_bytes'] for r in self.records)} bytes, {sum(r['samples'] for r in self.records)} samples, "
+            f"{sum(r['retries'] for r in self.records)} retries.",
+        )
+
+        for record in sorted(self.records, key=lambda r: r["duration"], reverse=True)[:top]:
+            _LOGGER.info(
+                f"Slow query {record['sli_name']}-{record['query_name']}: {record['duration']:.3f}s, "
+                f"{record['response_bytes']} bytes, {record['samples']} samples, {record['retries']} retries",
+            )
+
+
+def record_http_response(response_bytes: int) -> None:
+    """Account an HTTP response to the query being executed, if any."""
+    record = _CURRENT_QUERY.get()
+
+    if record is None:
+        return
+
+    with _RECORD_LOCK:
+        record["requests"] += 1
+        record["response_bytes"] += response_bytes
+
+
+def record_retry() -> None:
+    """Account a retried request to the query being executed, if any."""
+    record = _CURRENT_QUERY.get()
+
+    if record is None:
+        return
+
+    with _RECORD_LOCK:
+        record["retries"] += 1
+
+
+def record_samples(metric_data: List[Dict[str, Any]]) -> None:
+    """Account samples retrieved to the query being executed, if any."""
+    record = _CURRENT_QUERY.get()
+
+    if record is None:
+        return
+
+    samples = sum(len(metric_series["values"]) if "values" in metric_series else 1 for metric_series in metric_data)
+
+    with _RECORD_LOCK:
+        record["samples"] += samples
+
+
+def requests_response_hook(response: Any, *args: Any, **kwargs: Any) -> None:
+    """Response hook of requests sessions accounting responses to the query being executed."""
+    record_http_response(response_bytes=len(response.content))
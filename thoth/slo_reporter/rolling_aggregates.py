@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Totals of adviser inputs over a rolling window of days, maintained incrementally on Ceph.
+
+The state of each SLI class stores the totals of each day of the window, from which the totals of the window are merged,
+and the ETags of the daily objects they were aggregated from. A run retrieves only the days not aggregated yet (usually
+the newest one) and the days whose daily objects were rewritten since (e.g. by advise-reporter), and drops the days
+which left the window.
+"""
+
+import json
+import logging
+import datetime
+
+from typing import Callable, Dict, Iterable, List, Optional, Any
+
+import numpy as np
+import pandas as pd
+
+from thoth.storages import CephStore
+from thoth.storages.exceptions import NotFoundError
+
+from thoth.slo_reporter.sli_storage import get_sli_rolling_aggregate_key, list_sli_objects
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _to_builtin(value: Any) -> Any:
+    """Convert numpy scalars to Python ones, so that they can be stored as JSON."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def evaluate_daily_totals(daily_df: pd.DataFrame, quantity: str, key_columns: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Evaluate totals of a day for each value of quantity, from the first row of each value.
+
+    :output: total of each input in `counts`, with the values of key columns, keyed by key columns joined with -.
+    """
+    daily_totals: Dict[str, Dict[str, Any]] = {}
+
+    for parameter in daily_df[quantity].unique():
+        subset_df = daily_df[daily_df[quantity] == parameter]
+
+        if subset_df.empty:
+            continue
+
+        key = "-".join(str(subset_df[column].values[0]) for column in key_columns)
+        counts = _to_builtin(subset_df["total"].values[0])
+
+        if key in daily_totals:
+            daily_totals[key]["counts"] += counts
+        else:
+            daily_totals[key] = {column: _to_builtin(subset_df[column].values[0]) for column in key_columns}
+            daily_totals[key]["counts"] = counts
+
+    return daily_totals
+
+
+def merge_daily_totals(daily_totals: Iterable[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Sum totals of days, inputs being ordered by their first appearance."""
+    totals: Dict[str, Dict[str, Any]] = {}
+
+    for day_totals in daily_totals:
+        for key, entry in day_totals.items():
+            if key in totals:
+                totals[key]["counts"] += entry["counts"]
+            else:
+                totals[key] = dict(entry)
+
+    return totals
+
+
+class RollingWindowAggregate:
+    """Totals of an adviser input SLI class over a rolling window of days, stored on Ceph between runs."""
+
+    def __init__(self, ceph_sli: CephStore, sli_name: str, quantity: str, key_columns: Optional[List[str]] = None, store: bool = True):
+        """Initialize rolling window aggregate.
+
+        @param quantity: column identifying inputs in daily SLI.
+        @param key_columns: columns identifying inputs in totals, quantity if None.
+        @param store: store the updated state on Ceph, otherwise totals are evaluated from the stored state without updating it.
+        """
+        self.ceph_sli = ceph_sli
+        self.sli_name = sli_name
+        self.quantity = quantity
+        self.key_columns = key_columns or [quantity]
+        self.store = store
+        self.object_key = get_sli_rolling_aggregate_key(sli_name)
+
+    def _load(self) -> Dict[str, Any]:
+        """Load state of the aggregate, empty if it was never stored or was aggregated differently."""
+        empty_state: Dict[str, Any] = {"quantity": self.quantity, "key_columns": self.key_columns, "days": {}, "e_tags": {}}
+
+        try:
+            state = json.loads(self.ceph_sli.retrieve_blob(object_key=self.object_key).decode("utf-8"))
+        except NotFoundError:
+            return empty_state
+        except Exception as e:
+            _LOGGER.warning(f"No rolling aggregate could be retrieved for {self.sli_name}, the whole window is retrieved: {e}")
+            return empty_state
+
+        if state.get("quantity") != self.quantity or state.get("key_columns") != self.key_columns:
+            _LOGGER.warning(f"Rolling aggregate of {self.sli_name} was aggregated differently, the whole window is retrieved.")
+            return empty_state
+
+        # Running totals of states stored before are not used anymore.
+        return {"quantity": self.quantity, "key_columns": self.key_columns, "days": state.get("days", {}), "e_tags": state.get("e_tags", {})}
+
+    def _list_e_tags(self, window: List[str]) -> Optional[Dict[str, str]]:
+        """List ETags of the daily objects of days of the window, None if they cannot be listed."""
+        e_tags: Dict[str, str] = {}
+
+        try:
+            for month in sorted({day[:7] for day in window}):
+                for day, e_tag in list_sli_objects(self.ceph_sli, self.sli_name, month=month).values():
+                    # A day stored in both formats is identified by both objects.
+                    e_tags[str(day)] = f"{e_tags[str(day)]},{e_tag}" if str(day) in e_tags else e_tag
+        except Exception as e:
+            _LOGGER.warning(f"Daily objects of {self.sli_name} could not be listed, days already aggregated are kept: {e}")
+            return None
+
+        return e_tags
+
+    def _save(self, state: Dict[str, Any]) -> None:
+        """Store state of the aggregate."""
+        try:
+            # Keys are not sorted, as the order of inputs of each day is the order in which they are reported.
+            self.ceph_sli.store_blob(blob=json.dumps(state).encode("utf-8"), object_key=self.object_key)
+        except Exception as e:
+            _LOGGER.exception(f"Could not store rolling aggregate of {self.sli_name}...{e}")
+
+    def evaluate(
+        self,
+        start_date: datetime.date,
+        end_date: datetime.date,
+        retrieve: Callable[[List[datetime.date]], pd.DataFrame],
+    ) -> Dict[str, Dict[str, Any]]:
+        """Evaluate totals over days from start_date until end_date (excluded), updating the stored aggregate if store is set.
+
+        Days missing on Ceph are not aggregated, so that they are retrieved again by the next run. Days already aggregated
+        are aggregated again if their daily objects were rewritten since, as identified by their ETags.
+
+        @param retrieve: function retrieving daily SLI of days, with their day in column `date`.
+        :output: totals of inputs ordered by their first appearance in the window (see merge_daily_totals).
+        """
+        state = self._load()
+        window = [str(start_date + datetime.timedelta(days=day)) for day in range((end_date - start_date).days)]
+
+        e_tags = self._list_e_tags(window)
+
+        removed_days = [day for day in state["days"] if day not in window]
+        rewritten_days = []
+
+        if e_tags is not None:
+            rewritten_days = [day for day in window if day in state["days"] and state["e_tags"].get(day) != e_tags.get(day)]
+
+        for day in removed_days + rewritten_days:
+            state["days"].pop(day)
+            state["e_tags"].pop(day, None)
+
+        added_days = [day for day in window if day not in state["days"]]
+
+        aggregated_days = []
+
+        if added_days:
+            added_df = retrieve([datetime.date.fromisoformat(day) for day in added_days])
+
+            for day, daily_df in added_df.groupby("date", sort=False):
+                aggregated_days.append(day)
+                state["days"][day] = evaluate_daily_totals(daily_df, self.quantity, self.key_columns)
+
+                if e_tags is not None and day in e_tags:
+                    state["e_tags"][day] = e_tags[day]
+
+        totals = merge_daily_totals(state["days"][day] for day in window if day in state["days"])
+
+        _LOGGER.info(
+            f"Rolling aggregate of {self.sli_name}: {len(aggregated_days)} days added ({len(rewritten_days)} of them rewritten), "
+            f"{len(removed_days)} days left the window",
+        )
+
+        if self.store and (aggregated_days or removed_days or rewritten_days):
+            self._save(state)
+
+        return totals
@@ -27,6 +27,7 @@ from typing import Dict, List, Any
 from thoth.slo_reporter.sli_base import SLIBase
 from thoth.slo_reporter.sli_template import HTMLTemplates
 from thoth.slo_reporter.configuration import Configuration
+from thoth.slo_reporter.utils import promql_regex_union
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -50,29 +51,34 @@ class SLIWorkflowTaskLatency(SLIBase):
 
     def _query_sli(self) -> Dict[str, Any]:
         """Aggregate queries for component_latency SLI Report."""
-        queries = {}
-        for component in self.configuration.registered_workflow_tasks:
-            result = self._aggregate_queries(component=component)
-            for query_name, query in result.items():
-                queries[query_name] = query
-
-        return queries
-
-    def _aggregate_queries(self, component: str):
-        """Aggregate service queries."""
-        instance = self.configuration.registered_workflow_tasks[component]["instance"]
-        name = self.configuration.registered_workflow_tasks[component]["name"]
+        registered_components = self.configuration.registered_workflow_tasks
 
-        queries = {}
+        instances = promql_regex_union(registered_components[c]["instance"] for c in registered_components)
+        names = promql_regex_union(registered_components[c]["name"] for c in registered_components)
+        query_labels_workflows = f'{{field=~"{instances}", name=~"{names}"}}'
 
-        for bucket in self.configuration.buckets:
-            query_labels_workflows = f'{{field="{instance}", name="{name}", le="{bucket}"}}'
-            queries[f"{component}_workflows_task_latency_bucket_{bucket}"] = {
-                "query": f"argo_workflows_task_duration_seconds_histogram_bucket{query_labels_workflows}",
+        # All buckets of all components are retrieved with one grouped query.
+        return {
+            "workflows_task_latency_buckets": {
+                "query": f"sum by (field, name, le) (argo_workflows_task_duration_seconds_histogram_bucket{query_labels_workflows})",
                 "requires_range": True,
                 "type": "latest",
-            }
-        return queries
+                "series": self._aggregate_series(),
+            },
+        }
+
+    def _aggregate_series(self) -> Dict[str, Dict[str, str]]:
+        """Aggregate labels identifying the series of each component bucket."""
+        series = {}
+
+        for component in self.configuration.registered_workflow_tasks:
+            instance = self.configuration.registered_workflow_tasks[component]["instance"]
+            name = self.configuration.registered_workflow_tasks[component]["name"]
+
+            for bucket in self.configuration.buckets:
+                series[f"{component}_workflows_task_latency_bucket_{bucket}"] = {"field": instance, "name": name, "le": bucket}
+
+        return series
 
     def _evaluate_sli(self, sli: Dict[str, Any]) -> Dict[str, float]:
         """Evaluate SLI for report for component_latency SLI.
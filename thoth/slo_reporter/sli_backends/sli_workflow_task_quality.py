@@ -28,7 +28,8 @@ from typing import Dict, Any
 from thoth.slo_reporter.sli_base import SLIBase
 from thoth.slo_reporter.sli_template import HTMLTemplates
 from thoth.slo_reporter.configuration import Configuration
-from thoth.slo_reporter.utils import retrieve_thoth_sli_from_ceph, evaluate_change
+from thoth.slo_reporter.utils import retrieve_thoth_sli_from_ceph, evaluate_change, promql_regex_union
+from thoth.slo_reporter.sli_storage import get_sli_object_key
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -48,41 +49,36 @@ class SLIWorkflowTaskQuality(SLIBase):
 
     def _query_sli(self) -> Dict[str, Any]:
         """Aggregate queries for workflow_task_quality SLI Report."""
-        queries = {}
-        for component in self.configuration.registered_workflow_tasks:
-            result = self._aggregate_queries(component=component)
-            for query_name, query in result.items():
-                queries[query_name] = query
-
-        return queries
+        registered_components = self.configuration.registered_workflow_tasks
 
-    def _aggregate_queries(self, component: str):
-        """Aggregate component queries."""
-        instance = self.configuration.registered_workflow_tasks[component]["instance"]
-        name = self.configuration.registered_workflow_tasks[component]["name"]
-
-        query_labels_workflows_s = f'{{field="{instance}", name="{name}", status="Succeeded"}}'
-        query_labels_workflows_f = f'{{field="{instance}", name="{name}", status="Failed"}}'
-        query_labels_workflows_e = f'{{field="{instance}", name="{name}", status="Error"}}'
+        instances = promql_regex_union(registered_components[c]["instance"] for c in registered_components)
+        names = promql_regex_union(registered_components[c]["name"] for c in registered_components)
+        query_labels_workflows = f'{{field=~"{instances}", name=~"{names}", status=~"Succeeded|Failed|Error"}}'
 
+        # All statuses of all components are retrieved with one grouped query.
         return {
-            f"{component}_workflow_tasks_succeeded": {
-                "query": f"argo_workflows_task_status_counter{query_labels_workflows_s}",
-                "requires_range": True,
-                "type": "average",
-            },
-            f"{component}_workflow_tasks_failed": {
-                "query": f"argo_workflows_task_status_counter{query_labels_workflows_f}",
-                "requires_range": True,
-                "type": "average",
-            },
-            f"{component}_workflow_tasks_error": {
-                "query": f"argo_workflows_task_status_counter{query_labels_workflows_e}",
+            "workflow_tasks_status": {
+                "query": f"sum by (field, name, status) (argo_workflows_task_status_counter{query_labels_workflows})",
                 "requires_range": True,
                 "type": "average",
+                "series": self._aggregate_series(),
             },
         }
 
+    def _aggregate_series(self) -> Dict[str, Dict[str, str]]:
+        """Aggregate labels identifying the series of each component status."""
+        series = {}
+
+        for component in self.configuration.registered_workflow_tasks:
+            instance = self.configuration.registered_workflow_tasks[component]["instance"]
+            name = self.configuration.registered_workflow_tasks[component]["name"]
+
+            series[f"{component}_workflow_tasks_succeeded"] = {"field": instance, "name": name, "status": "Succeeded"}
+            series[f"{component}_workflow_tasks_failed"] = {"field": instance, "name": name, "status": "Failed"}
+            series[f"{component}_workflow_tasks_error"] = {"field": instance, "name": name, "status": "Error"}
+
+        return series
+
     def _evaluate_sli(self, sli: Dict[str, Any]) -> Dict[str, float]:
         """Evaluate SLI for report for component_latency SLI.
 
@@ -146,7 +142,7 @@ class SLIWorkflowTaskQuality(SLIBase):
         last_week_data = pd.DataFrame()
 
         if not self.configuration.dry_run:
-            sli_path = f"{self._SLI_NAME}/{self._SLI_NAME}-{self.configuration.last_week_time}.csv"
+            sli_path = get_sli_object_key(self._SLI_NAME, self.configuration.last_week_time)
             last_week_data = retrieve_thoth_sli_from_ceph(self.configuration.ceph_sli, sli_path, self.total_columns)
 
         for component in self.configuration.registered_workflow_tasks:
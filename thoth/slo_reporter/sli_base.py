@@ -21,6 +21,16 @@ import datetime
 
 from typing import Dict, List, Any
 
+from thoth.slo_reporter.query_policy import QueryPolicyOverrides
+from thoth.slo_reporter.tracing import traced
+
+# Methods of SLI classes traced, with the name of their span.
+_TRACED_METHODS = {
+    "_evaluate_sli": "evaluate",
+    "_report_sli": "report",
+    "_process_results_to_be_stored": "store",
+}
+
 
 class SLIBase:
     """This class contain base functions that need to be created for SLI."""
@@ -30,10 +40,23 @@ class SLIBase:
     default_columns = ["datetime", "timestamp"]
     sli_columns: List[str] = []
 
+    # Overrides of the query execution policy of the configuration for queries of the class,
+    # e.g. {"hedge_percentile": 90} or {"deadline": 600, "max_retries": 0} (see QueryPolicy).
+    query_policy: QueryPolicyOverrides = {}
+
+    def __init_subclass__(cls, **kwargs):
+        """Trace evaluate, report and store methods of SLI classes."""
+        super().__init_subclass__(**kwargs)
+
+        for method_name, span_name in _TRACED_METHODS.items():
+            if method_name in cls.__dict__:
+                setattr(cls, method_name, traced(f"{cls._SLI_NAME}.{span_name}", category="sli")(cls.__dict__[method_name]))
+
     def _aggregate_info(self):
         """Aggregate info required for specific SLI Report."""
         return {
             "query": self._query_sli(),
+            "query_policy": self.query_policy,
             "evaluation_method": self._evaluate_sli,
             "report_method": self._report_sli,
             "df_method": self._process_results_to_be_stored,
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Object keys and formats of SLI metrics stored on Ceph.
+
+SLI metrics are stored either as CSV (backtick separated, without header) or as Parquet, with an embedded schema
+and compression. The format is selected per deployment, objects stored as CSV before remain readable.
+
+Daily objects of past months can be compacted in monthly and yearly Parquet partitions (see compaction),
+listed by a manifest per SLI class.
+"""
+
+import os
+import re
+import json
+import logging
+import datetime
+
+from io import BytesIO, StringIO
+from typing import Dict, List, Optional, Tuple, Union, Any
+
+import pandas as pd
+
+from thoth.storages.exceptions import NotFoundError
+
+from thoth.slo_reporter.ceph_cache import CEPH_READ_CACHE
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+_LOGGER = logging.getLogger(__name__)
+
+# Format of stored SLI metrics: csv or parquet (requires pyarrow).
+_STORAGE_FORMAT = os.getenv("THOTH_SLO_REPORTER_STORAGE_FORMAT", "csv")
+_PARQUET_COMPRESSION = os.getenv("THOTH_SLO_REPORTER_PARQUET_COMPRESSION", "zstd")
+
+STORAGE_FORMATS = ["csv", "parquet"]
+
+
+def get_storage_format() -> str:
+    """Get format of SLI metrics stored by the deployment."""
+    if _STORAGE_FORMAT not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown storage format {_STORAGE_FORMAT!r}, use one of {STORAGE_FORMATS}.")
+
+    if _STORAGE_FORMAT == "parquet" and pyarrow is None:
+        raise ImportError("pyarrow is required to store SLI metrics as Parquet, install it to use it.")
+
+    return _STORAGE_FORMAT
+
+
+def get_sli_object_key(sli_name: str, day: Union[str, datetime.date], storage_format: Optional[str] = None) -> str:
+    """Get key of the object storing SLI metrics of a SLI class for a day, in the format of the deployment by default."""
+    return f"{sli_name}/{sli_name}-{day}.{storage_format or get_storage_format()}"
+
+
+def get_sli_object_day(sli_name: str, object_key: str) -> Optional[datetime.date]:
+    """Get day of the daily object storing SLI metrics of a SLI class, None if object_key is not one."""
+    match = re.fullmatch(rf"{re.escape(sli_name)}/{re.escape(sli_name)}-(\d{{4}}-\d{{2}}-\d{{2}})\.(csv|parquet)", object_key)
+    return datetime.date.fromisoformat(match.group(1)) if match else None
+
+
+def list_objects_with_e_tags(ceph_sli: Any, prefix_addition: str) -> Dict[str, str]:
+    """List keys of objects stored on Ceph under a prefix, with their ETag.
+
+    CephStore of thoth-storages lists keys only, so the listing relies on its S3 resource (`_s3`, set by `connect`),
+    `bucket` and `prefix`: it depends on the internals of thoth-storages and has to follow their changes.
+    Stores wrapping a CephStore (see cassette) provide the listing themselves.
+    """
+    if hasattr(type(ceph_sli), "list_objects_with_e_tags"):
+        return ceph_sli.list_objects_with_e_tags(prefix_addition=prefix_addition)  # type: ignore
+
+    prefix = f"{ceph_sli.prefix}{prefix_addition}"
+    return {
+        object_summary.key[len(ceph_sli.prefix) :]: object_summary.e_tag  # Ignore PycodestyleBear (E203)
+        for object_summary in ceph_sli._s3.Bucket(ceph_sli.bucket).objects.filter(Prefix=prefix).all()
+    }
+
+
+def list_sli_objects(ceph_sli: Any, sli_name: str, month: str = "") -> Dict[str, Tuple[datetime.date, str]]:
+    """List daily objects storing SLI metrics of a SLI class, of a month (e.g. 2022-01) if given.
+
+    :output: day and ETag of each daily object, keyed by object key.
+    """
+    sli_objects = {}
+
+    for object_key, e_tag in list_objects_with_e_tags(ceph_sli, prefix_addition=f"{sli_name}/{sli_name}-{month}").items():
+        day = get_sli_object_day(sli_name, object_key)
+
+        if day is not None:
+            sli_objects[object_key] = (day, e_tag)
+
+    return sli_objects
+
+
+def get_csv_object_key(object_key: str) -> str:
+    """Get key of the CSV object storing the same SLI metrics as object_key."""
+    return f"{os.path.splitext(object_key)[0]}.csv"
+
+
+def get_sli_partition_key(sli_name: str, period: str) -> str:
+    """Get key of the partition compacting SLI metrics of a SLI class for a month (e.g. 2022-01) or a year (e.g. 2022)."""
+    return f"{sli_name}/partitions/{sli_name}-{period}.parquet"
+
+
+def get_sli_manifest_key(sli_name: str) -> str:
+    """Get key of the manifest of partitions of a SLI class."""
+    return f"{sli_name}/partitions/manifest.json"
+
+
+def get_sli_rolling_aggregate_key(sli_name: str) -> str:
+    """Get key of the rolling aggregate of a SLI class over the days analyzed (see rolling_aggregates)."""
+    return f"{sli_name}/aggregates/rolling-window.json"
+
+
+def retrieve_compaction_manifest(ceph_sli: Any, sli_name: str) -> Dict[str, Dict[str, Any]]:
+    """Retrieve manifest of the partitions of a SLI class, at most once per run, empty if metrics were never compacted.
+
+    The manifest maps each compacted month to the days it contains and the ETags of their daily objects,
+    and each compacted year to its months.
+    """
+    return CEPH_READ_CACHE.get(ceph_sli, get_sli_manifest_key(sli_name), [], retrieve=_retrieve_compaction_manifest)  # type: ignore
+
+
+def _retrieve_compaction_manifest(ceph_sli: Any, ceph_path: str, total_columns: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Retrieve manifest of partitions from Ceph."""
+    try:
+        manifest = json.loads(ceph_sli.retrieve_blob(object_key=ceph_path).decode("utf-8"))
+    except NotFoundError:
+        manifest = {}
+    except Exception as e:
+        # Daily objects are kept once compacted, so they can be read instead of partitions.
+        _LOGGER.warning(f"No manifest of partitions could be retrieved at {ceph_path}: {e}")
+        manifest = {}
+
+    return {"months": manifest.get("months", {}), "years": manifest.get("years", {})}
+
+
+def store_compaction_manifest(ceph_sli: Any, sli_name: str, manifest: Dict[str, Dict[str, Any]]) -> None:
+    """Store manifest of the partitions of a SLI class."""
+    ceph_sli.store_blob(blob=json.dumps(manifest, sort_keys=True, indent=2).encode("utf-8"), object_key=get_sli_manifest_key(sli_name))
+    CEPH_READ_CACHE.invalidate(ceph_sli, get_sli_manifest_key(sli_name))
+
+
+def drop_compacted_day(ceph_sli: Any, sli_name: str, day: datetime.date) -> None:
+    """Drop the partitions containing a day from the manifest, once its daily object is stored again.
+
+    Reads of the month then use daily objects, until the month (and its year) is compacted again.
+    """
+    manifest = retrieve_compaction_manifest(ceph_sli, sli_name)
+
+    if get_day_partition_key(manifest, day) is None:
+        return
+
+    manifest["months"].pop(day.strftime("%Y-%m"))
+    manifest["years"].pop(str(day.year), None)
+    store_compaction_manifest(ceph_sli, sli_name, manifest)
+    _LOGGER.info(f"Daily object of {sli_name} for {day} was stored again, partitions of {day.strftime('%Y-%m')} are not used until compacted again")
+
+
+def get_day_partition_key(manifest: Dict[str, Dict[str, Any]], day: datetime.date) -> Optional[str]:
+    """Get key of the partition containing SLI metrics of a day, None if they are stored only in their daily object."""
+    month = manifest["months"].get(day.strftime("%Y-%m"))
+
+    if month is None or str(day) not in month["days"]:
+        return None
+
+    year = manifest["years"].get(str(day.year))
+
+    if year is not None and day.strftime("%Y-%m") in year["months"]:
+        return year["key"]  # type: ignore
+
+    return month["key"]  # type: ignore
+
+
+def serialize_sli(metrics_df: pd.DataFrame, object_key: str) -> bytes:
+    """Serialize SLI metrics in the format of the object they are stored in."""
+    if not object_key.endswith(".parquet"):
+        return metrics_df.to_csv(index=False, sep="`", header=False).encode("utf-8")
+
+    if pyarrow is None:
+        raise ImportError(f"pyarrow is required to store SLI metrics as Parquet in {object_key}, install it to use it.")
+
+    table_df = metrics_df.copy()
+
+    # Columns mixing values and errors (e.g. ErrorMetricRetrieval) are stored as strings, as CSV parses them.
+    for column in table_df.columns[table_df.dtypes == object]:
+        if len({type(value) for value in table_df[column].dropna()}) > 1:
+            table_df[column] = table_df[column].map(lambda value: value if pd.isna(value) else str(value))
+
+    buffer = BytesIO()
+    table = pyarrow.Table.from_pandas(table_df, preserve_index=False)
+    pyarrow.parquet.write_table(table, buffer, compression=_PARQUET_COMPRESSION)
+
+    return buffer.getvalue()
+
+
+def deserialize_sli(blob: bytes, object_key: str, total_columns: List[str]) -> pd.DataFrame:
+    """Deserialize SLI metrics stored in an object.
+
+    @param total_columns: columns of CSV objects, which do not store them; columns selected from Parquet objects.
+    """
+    if not object_key.endswith(".parquet"):
+        return pd.read_csv(StringIO(blob.decode("utf-8")), names=total_columns, sep="`")
+
+    if pyarrow is None:
+        raise ImportError(f"pyarrow is required to read SLI metrics stored as Parquet in {object_key}, install it to use it.")
+
+    return pyarrow.parquet.read_table(BytesIO(blob)).to_pandas().reindex(columns=total_columns)
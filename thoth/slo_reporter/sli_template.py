@@ -166,6 +166,13 @@ class HTMLTemplates:
         template = ENV.get_template("templates/thoth_adviser_justifications.html")
         return template.render(**parameters)
 
+    @staticmethod
+    def thoth_stale_metrics_template(html_inputs: Dict[str, Any]):
+        """Create HTML template to be used for metrics reported with their last known good value."""
+        parameters = locals()
+        template = ENV.get_template("templates/thoth_stale_metrics.html")
+        return template.render(**parameters)
+
     @staticmethod
     def thoth_references_template(html_inputs: Dict[str, Any]):
         """Create HTML template to be used for Thoth references."""
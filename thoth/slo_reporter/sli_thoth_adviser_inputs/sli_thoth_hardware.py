@@ -25,7 +25,7 @@ from typing import Dict, List, Any
 from thoth.slo_reporter.sli_base import SLIBase
 from thoth.slo_reporter.sli_template import HTMLTemplates
 from thoth.slo_reporter.configuration import Configuration
-from thoth.slo_reporter.utils import retrieve_thoth_sli_from_ceph
+from thoth.slo_reporter.utils import evaluate_adviser_inputs_totals
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -60,44 +60,15 @@ class SLIThothHardwareInputs(SLIBase):
         html_inputs: Dict[str, Any] = {}
         total_quantity: Dict[str, Any] = {}
 
-        days = self.configuration.adviser_inputs_analysis_days
-        delta = datetime.timedelta(days=1)
-
         if not self.configuration.dry_run:
 
-            e_time = self.configuration.start_time.strftime("%Y-%m-%d").split("-")
-            current_end_time = datetime.date(
-                year=int(e_time[0]),
-                month=int(e_time[1]),
-                day=int(e_time[2]),
-            ) + datetime.timedelta(days=1)
-            current_initial_date = current_end_time - datetime.timedelta(days=days)
-
-            while current_initial_date < current_end_time:
-
-                _LOGGER.info(f"Analyzing for start date: {current_initial_date}")
-
-                sli_path = f"{self._SLI_NAME}/{self._SLI_NAME}-{current_initial_date}.csv"
-                daily_quantity_df = retrieve_thoth_sli_from_ceph(
-                    self.configuration.ceph_sli,
-                    sli_path,
-                    [c for c in self.total_columns if c != "timestamp"],
-                )
-
-                for cpu_model in daily_quantity_df["cpu_model"].unique():
-                    subset_df = daily_quantity_df[daily_quantity_df["cpu_model"] == cpu_model]
-
-                    hardware = f"{subset_df['cpu_model'].values[0]}-{subset_df['cpu_family'].values[0]}"
-                    if hardware not in total_quantity:
-                        total_quantity[hardware] = {
-                            "cpu_model": subset_df["cpu_model"].values[0],
-                            "cpu_family": subset_df["cpu_family"].values[0],
-                            "counts": subset_df["total"].values[0],
-                        }
-                    else:
-                        total_quantity[hardware]["counts"] += subset_df["total"].values[0]
-
-                current_initial_date += delta
+            total_quantity = evaluate_adviser_inputs_totals(
+                sli_name=self._SLI_NAME,
+                total_columns=self.total_columns,
+                quantity="cpu_model",
+                configuration=self.configuration,
+                key_columns=["cpu_model", "cpu_family"],
+            )
 
             total_ = 0
             for _, total_counts in total_quantity.items():
@@ -29,6 +29,7 @@ from thoth.slo_reporter.sli_base import SLIBase
 from thoth.slo_reporter.sli_template import HTMLTemplates
 from thoth.slo_reporter.configuration import Configuration
 from thoth.slo_reporter.utils import retrieve_thoth_sli_from_ceph, evaluate_change
+from thoth.slo_reporter.sli_storage import get_sli_object_key
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -82,7 +83,7 @@ class SLIThothIntegrationsUsers(SLIBase):
         last_week_data = pd.DataFrame()
 
         if not self.configuration.dry_run:
-            sli_path = f"{self._SLI_NAME}/{self._SLI_NAME}-{self.configuration.last_week_time}.csv"
+            sli_path = get_sli_object_key(self._SLI_NAME, self.configuration.last_week_time)
             last_week_data = retrieve_thoth_sli_from_ceph(self.configuration.ceph_sli, sli_path, self.total_columns)
 
         for thoth_integration in ["KEBECHET"]:
@@ -25,7 +25,7 @@ from typing import Dict, List, Any
 from thoth.slo_reporter.sli_base import SLIBase
 from thoth.slo_reporter.sli_template import HTMLTemplates
 from thoth.slo_reporter.configuration import Configuration
-from thoth.slo_reporter.utils import retrieve_thoth_sli_from_ceph
+from thoth.slo_reporter.utils import get_adviser_inputs_window, retrieve_thoth_sli_window_from_ceph
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -60,29 +60,21 @@ class SLIThothAdviserReportsStatistics(SLIBase):
         html_inputs = []
         total_statistics: Dict[str, Any] = {}
 
-        days = self.configuration.adviser_inputs_analysis_days
-        delta = datetime.timedelta(days=1)
-
         if not self.configuration.dry_run:
 
-            e_time = self.configuration.start_time.strftime("%Y-%m-%d").split("-")
-            current_end_time = datetime.date(
-                year=int(e_time[0]),
-                month=int(e_time[1]),
-                day=int(e_time[2]),
-            ) + datetime.timedelta(days=1)
-            current_initial_date = current_end_time - datetime.timedelta(days=days)
-
-            while current_initial_date < current_end_time:
+            start_date, end_date = get_adviser_inputs_window(self.configuration)
+            _LOGGER.info(f"Analyzing {self._SLI_NAME} from {start_date} until {end_date}")
 
-                _LOGGER.info(f"Analyzing for start date: {current_initial_date}")
+            window_df = retrieve_thoth_sli_window_from_ceph(
+                self.configuration.ceph_sli,
+                sli_name=self._SLI_NAME,
+                start_date=start_date,
+                end_date=end_date,
+                total_columns=[c for c in self.total_columns if c not in ["timestamp", "datetime"]],
+                max_workers=self.configuration.ceph_concurrency,
+            )
 
-                sli_path = f"{self._SLI_NAME}/{self._SLI_NAME}-{current_initial_date}.csv"
-                daily_statistics_df = retrieve_thoth_sli_from_ceph(
-                    self.configuration.ceph_sli,
-                    sli_path,
-                    [c for c in self.total_columns if c not in ["timestamp", "datetime"]],
-                )
+            for _, daily_statistics_df in window_df.groupby("date", sort=False):
 
                 for adviser_version in daily_statistics_df["adviser_version"].unique():
                     subset_df = daily_statistics_df[daily_statistics_df["adviser_version"] == adviser_version]
@@ -103,8 +95,6 @@ class SLIThothAdviserReportsStatistics(SLIBase):
                         total_statistics[adviser_version]["success"] += s_counts
                         total_statistics[adviser_version]["failure"] += f_counts
 
-                current_initial_date += delta
-
             for adviser_version, statistics_info in total_statistics.items():
 
                 total = statistics_info["success"] + statistics_info["failure"]
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# slo-reporter
+# Copyright(C) 2022 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and / or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+"""Lightweight tracing of SLO-reporter runs, exported in Chrome trace format (chrome://tracing, Perfetto)."""
+
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import contextlib
+
+from typing import Callable, Dict, Iterator, List, Optional, Any
+
+_LOGGER = logging.getLogger(__name__)
+
+_TRACE_FILE = os.getenv("THOTH_SLO_REPORTER_TRACE_FILE")
+
+
+class Tracer:
+    """Collect spans of a process, as complete events of the Chrome trace format."""
+
+    def __init__(self, enabled: bool):
+        """Initialize tracer.
+
+        @param enabled: record spans, if disabled spans cost a function call.
+        """
+        self.enabled = enabled
+        self.events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = "slo_reporter", **args: Any) -> Iterator[None]:
+        """Record a span around the wrapped block, args are attached to the span."""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+
+            with self._lock:
+                self._threads[thread.ident] = thread.name  # type: ignore
+                self.events.append(
+                    {
+                        "name": name,
+                        "cat": category,
+                        "ph": "X",
+                        "ts": start * 1e6,
+                        "dur": (end - start) * 1e6,
+                        "pid": os.getpid(),
+                        "tid": thread.ident,
+                        "args": {arg: str(value) for arg, value in args.items()},
+                    },
+                )
+
+    def export(self, trace_file: str) -> None:
+        """Export spans recorded to a Chrome trace file."""
+        with self._lock:
+            thread_names = [
+                {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}} for tid, name in self._threads.items()
+            ]
+            trace = {"traceEvents": thread_names + self.events, "displayTimeUnit": "ms"}
+
+        with open(trace_file, "w") as f:
+            json.dump(trace, f)
+
+        _LOGGER.info(f"Trace with {len(self.events)} spans exported to {trace_file}")
+
+
+TRACER = Tracer(enabled=bool(_TRACE_FILE))
+
+
+def traced(name: str, category: str = "slo_reporter") -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Decorate a function to record a span for each of its calls."""
+
+    def decorator(function: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(function)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with TRACER.span(name, category=category):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def export_trace(trace_file: Optional[str] = _TRACE_FILE) -> None:
+    """Export spans recorded to the trace file set by THOTH_SLO_REPORTER_TRACE_FILE, if any."""
+    if trace_file:
+        TRACER.export(trace_file)
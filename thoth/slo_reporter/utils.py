@@ -17,25 +17,99 @@
 
 """Collection of methods used in SLO-reporter."""
 
+import json
 import logging
-import statistics
+import math
+import re
 import datetime
 
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 import numpy as np
 
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Iterable, Optional, Tuple, Union, Any
 
 from thoth.storages import CephStore
+from thoth.storages.exceptions import NotFoundError
 
 from thoth.slo_reporter.configuration import Configuration, _get_sli_metrics_prefix
+from thoth.slo_reporter.ceph_cache import CEPH_READ_CACHE
+from thoth.slo_reporter.sli_storage import get_sli_object_key, get_csv_object_key, serialize_sli, deserialize_sli
+from thoth.slo_reporter.sli_storage import retrieve_compaction_manifest, get_day_partition_key, get_sli_object_day, drop_compacted_day
+from thoth.slo_reporter.rolling_aggregates import RollingWindowAggregate, evaluate_daily_totals, merge_daily_totals
 
 _LOGGER = logging.getLogger(__name__)
 
 
-def manipulate_retrieved_metrics_vector(metrics_vector: List[float], action: str) -> float:
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+
+
+def parse_duration(duration: str) -> int:
+    """Parse a Prometheus duration (e.g. `1h`, `1h30m`, `90`) in seconds."""
+    if re.fullmatch(r"\d+", duration):
+        return int(duration)
+
+    parts = re.findall(r"(\d+)([smhdwy])", duration)
+
+    if not parts or "".join(f"{value}{unit}" for value, unit in parts) != duration:
+        raise ValueError(f"Invalid duration: {duration!r}")
+
+    return sum(int(value) * _DURATION_UNITS[unit] for value, unit in parts)
+
+
+# Steps selected for range queries, all of them divide a day so that daily intervals share timestamps.
+_QUERY_STEPS = ["1m", "2m", "5m", "10m", "15m", "30m", "1h", "2h", "3h", "6h", "12h", "1d"]
+
+# Resolutions of Thanos downsampled blocks, from the lowest.
+_THANOS_RESOLUTIONS = ["1h", "5m"]
+
+
+def select_query_step(window: int, point_budget: int, min_step: str) -> str:
+    """Select the finest step keeping the points of a range query within budget.
+
+    :parameter: window: seconds covered by the range query.
+    :parameter: point_budget: maximum number of points per series.
+    :parameter: min_step: finest step allowed.
+    """
+    required_step = max(window / point_budget, parse_duration(min_step))
+
+    for step in _QUERY_STEPS:
+        if parse_duration(step) >= required_step:
+            return step
+
+    return f"{math.ceil(required_step / 86400)}d"
+
+
+def select_max_source_resolution(query: str, step: str) -> str:
+    """Select the lowest resolution of Thanos downsampled blocks usable for a query evaluated at step.
+
+    Range selectors of the query have to cover several samples of the selected resolution
+    (5 as suggested by Thanos), otherwise raw data is used.
+    """
+    step_seconds = parse_duration(step)
+    range_selectors = [parse_duration(r) for r in re.findall(r"\[(\d+[smhdwy](?:\d+[smhdwy])*)(?::[^\]]*)?\]", query)]
+
+    for resolution in _THANOS_RESOLUTIONS:
+        resolution_seconds = parse_duration(resolution)
+
+        if step_seconds >= resolution_seconds and all(r >= 5 * resolution_seconds for r in range_selectors):
+            return resolution
+
+    return "0s"
+
+
+def parse_metric_values(values: List[List[Any]]) -> np.ndarray:
+    """Parse values of a range series retrieved from Prometheus/Thanos (`[timestamp, "value"]` pairs) in a float64 array."""
+    return np.array([value[1] for value in values], dtype=np.float64)
+
+
+def manipulate_retrieved_metrics_vector(
+    metrics_vector: Union[np.ndarray, List[float]],
+    action: str,
+    timestamps: Optional[np.ndarray] = None,
+    window: Optional[Tuple[float, float]] = None,
+) -> float:
     """Manipulate metrics vector obtained from Prometheus/Thanos depending on the requested result type.
 
     :parameter: metrics_vector: metrics vector
@@ -45,54 +119,273 @@ def manipulate_retrieved_metrics_vector(metrics_vector: List[float], action: str
         verifying all values retrieved are in ascending order otherwise they are removed.
     - `average` -> Average value of vector without 0 values.
     - `latest` -> Latest value of vector different from 0.
+    - `increase` -> Increase of a counter over the window, as Prometheus `increase()`.
+    - `rate` -> Per-second increase of a counter over the window, as Prometheus `rate()`.
+    :parameter: timestamps: timestamps of the metrics vector, required by `increase` and `rate`.
+    :parameter: window: start and end timestamps of the range, first and last timestamps by default.
 
     :output: metric/SLI
     """
+    metrics_vector = np.asarray(metrics_vector, dtype=np.float64)
+
+    if action in ("increase", "rate"):
+        if timestamps is None:
+            raise ValueError(f"Timestamps are required by action {action!r}")
+
+        return extrapolated_increase(metrics_vector=metrics_vector, timestamps=timestamps, window=window, is_rate=action == "rate")
+
     # Make sure 0 results are not considered
+    metrics_vector = metrics_vector[metrics_vector > 0]
+
     metric = 0.0
-    if not metrics_vector:
+    if not metrics_vector.size:
         return metric
 
     if action == "min_max":
-        metric = max(metrics_vector) - min(metrics_vector)
+        metric = metrics_vector.max() - metrics_vector.min()
 
     elif action == "delta":
-        modified_results = _evaluate_ascending_results(metrics_vector=metrics_vector)
         metric = metrics_vector[-1] - metrics_vector[0]
 
     elif action == "min_max_only_ascending":
         modified_results = _evaluate_ascending_results(metrics_vector=metrics_vector)
-        metric = max(modified_results) - min(modified_results)
+        metric = modified_results.max() - modified_results.min()
 
     elif action == "average":
-        metric = statistics.mean(metrics_vector)
+        metric = metrics_vector.mean()
 
     elif action == "latest":
         metric = metrics_vector[-1]
 
-    return metric
+    return float(metric)
 
 
-def _evaluate_ascending_results(metrics_vector: List[float]) -> List[float]:
-    """Evaluate vector with only ascending values."""
-    counter = 0
-    modified_vector = []
+def extrapolated_increase(
+    metrics_vector: np.ndarray,
+    timestamps: np.ndarray,
+    window: Optional[Tuple[float, float]] = None,
+    is_rate: bool = False,
+) -> float:
+    """Evaluate the increase of a counter over a window following Prometheus `increase()`/`rate()` semantics.
 
-    for retrieved_value in metrics_vector:
-        if counter == 0:
-            modified_vector.append(retrieved_value)
+    Any decrease is considered a counter reset, and the increase observed between first and last sample
+    is extrapolated to the window boundaries (up to half the average interval between samples,
+    and never below the counter's zero).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    present = ~np.isnan(metrics_vector)
+    metrics_vector, timestamps = metrics_vector[present], timestamps[present]
 
-        else:
+    if metrics_vector.size < 2:
+        return 0.0
 
-            if retrieved_value > metrics_vector[counter - 1]:
-                modified_vector.append(retrieved_value)
+    range_start, range_end = window if window is not None else (timestamps[0], timestamps[-1])
 
-            else:
-                pass
+    resets = metrics_vector[1:] < metrics_vector[:-1]
+    result = metrics_vector[-1] - metrics_vector[0] + metrics_vector[:-1][resets].sum()
+
+    sampled_interval = timestamps[-1] - timestamps[0]
+    average_duration_between_samples = sampled_interval / (metrics_vector.size - 1)
+    extrapolation_threshold = average_duration_between_samples * 1.1
+
+    duration_to_start = timestamps[0] - range_start
+    duration_to_end = range_end - timestamps[-1]
+
+    if result > 0 and metrics_vector[0] >= 0:
+        # The counter cannot be extrapolated below zero.
+        duration_to_start = min(duration_to_start, sampled_interval * (metrics_vector[0] / result))
+
+    extrapolate_to_interval = sampled_interval
+    extrapolate_to_interval += duration_to_start if duration_to_start < extrapolation_threshold else average_duration_between_samples / 2
+    extrapolate_to_interval += duration_to_end if duration_to_end < extrapolation_threshold else average_duration_between_samples / 2
+
+    result *= extrapolate_to_interval / sampled_interval
+
+    if is_rate:
+        result /= range_end - range_start
+
+    return float(result)
+
+
+# PromQL equivalents of the actions in manipulate_retrieved_metrics_vector, applied to a subquery.
+_SERVER_SIDE_REDUCTIONS = {
+    "min_max": "max_over_time({subquery}) - min_over_time({subquery})",
+    "average": "avg_over_time({subquery})",
+    "latest": "last_over_time({subquery})",
+    "increase": "increase({counter_subquery})",
+    "rate": "rate({counter_subquery})",
+}
+
+
+def compile_server_side_reduction(query: str, action: str, window: str, step: str) -> Optional[str]:
+    """Compile the manipulation of a range query into an instant query evaluated by Prometheus/Thanos.
+
+    :parameter: query: PromQL query that would be requested as range query.
+    :parameter: action: Type of manipulation as in `manipulate_retrieved_metrics_vector`.
+    :parameter: window: Duration of the range (e.g. `86400s`).
+    :parameter: step: Resolution of the range (e.g. `1h`).
+
+    :output: instant query, or None if the action has no PromQL equivalent
+        (`delta` and `min_max_only_ascending` depend on the order of the samples).
+    """
+    reduction = _SERVER_SIDE_REDUCTIONS.get(action)
+
+    if reduction is None:
+        return None
+
+    # Make sure 0 results are not considered, as in the client-side reduction.
+    subquery = f"(({query}) > 0)[{window}:{step}]"
+
+    # Counters keep 0 samples, which are needed to detect resets.
+    counter_subquery = f"({query})[{window}:{step}]"
+
+    reduced_query = reduction.format(subquery=subquery, counter_subquery=counter_subquery)
+
+    if "{subquery}" not in reduction:
+        return reduced_query
+
+    # Series without positive samples are dropped by the subquery, they are reduced to 0 as in the client-side reduction.
+    return f"({reduced_query}) or (last_over_time({counter_subquery}) * 0)"
+
+
+def _evaluate_ascending_results(metrics_vector: np.ndarray) -> np.ndarray:
+    """Evaluate vector with only ascending values.
+
+    The first value is always kept, any other value is kept if greater than the value preceding it in the vector.
+    """
+    return metrics_vector[np.concatenate(([True], metrics_vector[1:] > metrics_vector[:-1]))]
+
+
+def demultiplex_metric_data(
+    metric_data: List[Dict[str, Any]],
+    series_labels: Dict[str, Dict[str, str]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Demultiplex series returned by a grouped query into the metrics they belong to.
+
+    :parameter: metric_data: series returned by Prometheus/Thanos.
+    :parameter: series_labels: map of metric names to the labels identifying their series.
+
+    :output: map of metric names to their series (empty if no series matches the labels).
+    """
+    demultiplexed_data: Dict[str, List[Dict[str, Any]]] = {}
+
+    for metric_name, labels in series_labels.items():
+        demultiplexed_data[metric_name] = [
+            metric_series
+            for metric_series in metric_data
+            if all(metric_series["metric"].get(label) == value for label, value in labels.items())
+        ]
+
+    return demultiplexed_data
+
+
+# Labels distinguishing replicas of the same series, e.g. scraped by replicated Prometheus instances.
+_REPLICA_LABELS = ["replica", "prometheus_replica"]
+
+
+def build_metric_matrix(metric_data: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Align series retrieved from Prometheus/Thanos in a timestamp x series array.
+
+    Series of an instant query are handled as range series with one sample.
+
+    :output: sorted timestamps and array of values, NaN where a series has no sample at a timestamp.
+    """
+    if not metric_data:
+        raise ValueError("No series to be aggregated.")
+
+    series_values = [metric_series["values"] if "values" in metric_series else [metric_series["value"]] for metric_series in metric_data]
+    series_timestamps = [np.array([float(value[0]) for value in values], dtype=np.float64) for values in series_values]
+
+    timestamps = np.unique(np.concatenate(series_timestamps))
+    matrix = np.full((timestamps.size, len(series_values)), np.nan)
+
+    for i, (values, value_timestamps) in enumerate(zip(series_values, series_timestamps)):
+        matrix[np.searchsorted(timestamps, value_timestamps), i] = parse_metric_values(values)
 
-        counter += 1
+    return timestamps, matrix
 
-    return modified_vector
+
+def aggregate_metric_data(
+    metric_data: List[Dict[str, Any]],
+    aggregation: str,
+    replica_labels: Optional[List[str]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Aggregate series retrieved from Prometheus/Thanos in one metrics vector.
+
+    :parameter: metric_data: series returned by Prometheus/Thanos.
+    :parameter: aggregation: Type of aggregation of the series.
+    - `first` -> First series returned, any other series is ignored.
+    - `sum` -> Sum of the series at each timestamp.
+    - `max` -> Max of the series at each timestamp.
+    - `dedup` -> Replicas of a series (same labels except replica labels) are deduplicated,
+        keeping at each timestamp the first replica with a sample, then the series are summed.
+    :parameter: replica_labels: labels distinguishing replicas for `dedup`, `replica` and `prometheus_replica` by default.
+
+    :output: timestamps and metrics vector, NaN at timestamps without samples.
+    """
+    if aggregation == "first":
+        values = metric_data[0]["values"] if "values" in metric_data[0] else [metric_data[0]["value"]]
+        return np.array([float(value[0]) for value in values], dtype=np.float64), parse_metric_values(values)
+
+    timestamps, matrix = build_metric_matrix(metric_data)
+
+    if aggregation == "dedup":
+        replica_labels = _REPLICA_LABELS if replica_labels is None else replica_labels
+        groups: Dict[str, List[int]] = {}
+
+        for i, metric_series in enumerate(metric_data):
+            labels = {label: value for label, value in metric_series["metric"].items() if label not in replica_labels}
+            groups.setdefault(json.dumps(labels, sort_keys=True), []).append(i)
+
+        deduplicated_matrix = np.empty((matrix.shape[0], len(groups)))
+
+        for j, columns in enumerate(groups.values()):
+            replicas = matrix[:, columns]
+            first_replica = np.argmax(~np.isnan(replicas), axis=1)
+            deduplicated_matrix[:, j] = replicas[np.arange(replicas.shape[0]), first_replica]
+
+        matrix = deduplicated_matrix
+        aggregation = "sum"
+
+    missing = np.isnan(matrix).all(axis=1)
+
+    if aggregation == "sum":
+        return timestamps, np.where(missing, np.nan, np.nansum(matrix, axis=1))
+
+    if aggregation == "max":
+        return timestamps, np.fmax.reduce(matrix, axis=1)
+
+    raise ValueError(f"Unknown aggregation: {aggregation!r}")
+
+
+def slice_metric_data(
+    metric_data: List[Dict[str, Any]],
+    start_time: datetime.datetime,
+    end_time: datetime.datetime,
+) -> List[Dict[str, Any]]:
+    """Slice series retrieved by a range query to the samples between start and end time (included).
+
+    Series without samples in the interval are dropped, as Prometheus/Thanos would not return them.
+    """
+    start = round(start_time.timestamp())
+    end = round(end_time.timestamp())
+
+    sliced_metric_data = []
+
+    for metric_series in metric_data:
+        values = [v for v in metric_series["values"] if start <= float(v[0]) <= end]
+
+        if values:
+            sliced_metric_data.append({"metric": metric_series["metric"], "values": values})
+
+    return sliced_metric_data
+
+
+def promql_regex_union(values: Iterable[str]) -> str:
+    """Create a PromQL regex matching any of the given label values exactly."""
+    unique_values = sorted(set(values))
+    # Backslashes introduced by escaping have to be escaped again inside PromQL string literals.
+    return "|".join(re.escape(value).replace("\\", "\\\\") for value in unique_values)
 
 
 def evaluate_change(old_value: float, new_value: float, is_storing: bool = False) -> str:
@@ -135,7 +428,7 @@ def process_html_inputs(
     is_storing: bool = False,
 ) -> Dict[str, Any]:
     """Process HTML inputs."""
-    sli_path = f"{sli_name}/{sli_name}-{last_period_time}.csv"
+    sli_path = get_sli_object_key(sli_name, last_period_time)
     last_week_data = retrieve_thoth_sli_from_ceph(ceph_sli, sli_path, store_columns)
 
     for c in sli_columns:
@@ -170,8 +463,8 @@ def store_thoth_sli_on_ceph(
     ceph_path: str,
     is_public: bool = False,
 ) -> None:
-    """Store Thoth SLI on Ceph."""
-    metrics_csv = metrics_df.to_csv(index=False, sep="`", header=False)
+    """Store Thoth SLI on Ceph, in the format given by the extension of ceph_path (see get_sli_object_key)."""
+    metrics_blob = serialize_sli(metrics_df, object_key=ceph_path)
 
     if is_public:
         _LOGGER.info(f"Storing on public bucket... {ceph_path}")
@@ -179,18 +472,40 @@ def store_thoth_sli_on_ceph(
     else:
         _LOGGER.info(f"Storing on private bucket... {ceph_path}")
 
-    ceph_sli.store_blob(blob=metrics_csv, object_key=ceph_path)
+    ceph_sli.store_blob(blob=metrics_blob, object_key=ceph_path)
+    CEPH_READ_CACHE.invalidate(ceph_sli, ceph_path)
     _LOGGER.info(f"Succesfully stored Thoth weekly SLI metrics for {metric_class} at {ceph_path}")
 
+    day = get_sli_object_day(metric_class, ceph_path)
+
+    if not is_public and day:
+        # Partitions compacted before contain the previous content of the day.
+        drop_compacted_day(ceph_sli, metric_class, day)
+
 
 def retrieve_thoth_sli_from_ceph(ceph_sli: CephStore, ceph_path: str, total_columns: List[str]) -> pd.DataFrame:
+    """Retrieve Thoth SLI from Ceph, at most once per run (see CephReadCache)."""
+    return CEPH_READ_CACHE.get(ceph_sli, ceph_path, total_columns, retrieve=_retrieve_thoth_sli_from_ceph)
+
+
+def _retrieve_thoth_sli_from_ceph(ceph_sli: CephStore, ceph_path: str, total_columns: List[str]) -> pd.DataFrame:
     """Retrieve Thoth SLI from Ceph."""
     _LOGGER.info(f"Retrieving... \n{ceph_path}")
     try:
-        retrieved_data = ceph_sli.retrieve_blob(object_key=ceph_path).decode("utf-8")
-        data = StringIO(retrieved_data)
-        _LOGGER.debug(f"retrieved data:\n {data}")
-        last_data = pd.read_csv(data, names=total_columns, sep="`")
+        object_key = ceph_path
+
+        try:
+            retrieved_data = ceph_sli.retrieve_blob(object_key=object_key)
+        except NotFoundError:
+            # SLI metrics stored before the deployment switched to another format are stored as CSV.
+            if get_csv_object_key(ceph_path) == ceph_path:
+                raise
+
+            object_key = get_csv_object_key(ceph_path)
+            retrieved_data = ceph_sli.retrieve_blob(object_key=object_key)
+
+        last_data = deserialize_sli(retrieved_data, object_key=object_key, total_columns=total_columns)
+        _LOGGER.debug(f"retrieved data:\n {last_data}")
 
     except Exception as e:
         _LOGGER.warning(f"No file could be retrieved from Ceph: {e}")
@@ -199,6 +514,159 @@ def retrieve_thoth_sli_from_ceph(ceph_sli: CephStore, ceph_path: str, total_colu
     return last_data
 
 
+def get_adviser_inputs_window(configuration: Configuration) -> Tuple[datetime.date, datetime.date]:
+    """Get days analyzed for adviser inputs, the last one being the start day of the report.
+
+    :output: first day and day after the last one.
+    """
+    end_date = configuration.start_time.date() + datetime.timedelta(days=1)
+    return end_date - datetime.timedelta(days=configuration.adviser_inputs_analysis_days), end_date
+
+
+def retrieve_daily_thoth_sli_from_ceph(
+    ceph_sli: CephStore,
+    sli_name: str,
+    days: List[datetime.date],
+    total_columns: List[str],
+    max_workers: int = 8,
+) -> List[pd.DataFrame]:
+    """Retrieve Thoth SLI of a SLI class from the daily objects of days, concurrently (empty if missing)."""
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(days)))) as executor:
+        return list(
+            executor.map(
+                lambda day: retrieve_thoth_sli_from_ceph(ceph_sli, get_sli_object_key(sli_name, day), total_columns),
+                days,
+            ),
+        )
+
+
+def retrieve_thoth_sli_days_from_ceph(
+    ceph_sli: CephStore,
+    sli_name: str,
+    days: List[datetime.date],
+    total_columns: List[str],
+    max_workers: int = 8,
+) -> pd.DataFrame:
+    """Retrieve daily Thoth SLI of a SLI class from Ceph for days.
+
+    Days of compacted months are read from their partition, other days from their daily object. Objects are
+    retrieved concurrently, days missing on Ceph are reported and skipped.
+
+    :output: daily SLI concatenated in order of days, with their day (e.g. 2022-01-31) in column `date`.
+    """
+    manifest = retrieve_compaction_manifest(ceph_sli, sli_name)
+    partition_keys = {day: get_day_partition_key(manifest, day) for day in days}
+
+    # Each partition is retrieved once for all the days it contains.
+    object_keys = list(dict.fromkeys(partition_keys[day] or get_sli_object_key(sli_name, day) for day in days))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(object_keys)))) as executor:
+        object_dfs = dict(
+            zip(
+                object_keys,
+                executor.map(
+                    lambda object_key: retrieve_thoth_sli_from_ceph(
+                        ceph_sli,
+                        object_key,
+                        total_columns + ["date"] if object_key in partition_keys.values() else total_columns,
+                    ),
+                    object_keys,
+                ),
+            ),
+        )
+
+    daily_dfs = []
+
+    for day in days:
+        partition_key = partition_keys[day]
+
+        if partition_key is None:
+            daily_dfs.append(object_dfs[get_sli_object_key(sli_name, day)])
+        else:
+            partition_df = object_dfs[partition_key]
+            daily_dfs.append(partition_df[partition_df["date"] == str(day)].drop(columns="date").reset_index(drop=True))
+
+    missing_days = [str(day) for day, daily_df in zip(days, daily_dfs) if daily_df.empty]
+
+    if missing_days:
+        _LOGGER.warning(f"No {sli_name} data on Ceph for days: {', '.join(missing_days)}")
+
+    retrieved_dfs = [daily_df.assign(date=str(day)) for day, daily_df in zip(days, daily_dfs) if not daily_df.empty]
+
+    if not retrieved_dfs:
+        return pd.DataFrame(columns=total_columns + ["date"])
+
+    return pd.concat(retrieved_dfs, ignore_index=True)
+
+
+def retrieve_thoth_sli_window_from_ceph(
+    ceph_sli: CephStore,
+    sli_name: str,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    total_columns: List[str],
+    max_workers: int = 8,
+) -> pd.DataFrame:
+    """Retrieve daily Thoth SLI of a SLI class from Ceph for all days from start_date until end_date (excluded).
+
+    :output: daily SLI concatenated in order of days, with their day (e.g. 2022-01-31) in column `date`.
+    """
+    days = [start_date + datetime.timedelta(days=day) for day in range((end_date - start_date).days)]
+    return retrieve_thoth_sli_days_from_ceph(ceph_sli, sli_name, days=days, total_columns=total_columns, max_workers=max_workers)
+
+
+def evaluate_adviser_inputs_totals(
+    sli_name: str,
+    total_columns: List[str],
+    quantity: str,
+    configuration: Configuration,
+    key_columns: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Evaluate totals of adviser inputs over the analyzed days, incrementally if rolling aggregates are enabled.
+
+    @param quantity: column identifying inputs in daily SLI, each day counts the first row of each input.
+    @param key_columns: columns identifying inputs in totals, quantity if None.
+    :output: total of each input in `counts`, with the values of key columns.
+    """
+    start_date, end_date = get_adviser_inputs_window(configuration)
+    _LOGGER.info(f"Analyzing {sli_name} from {start_date} until {end_date}")
+
+    columns = [c for c in total_columns if c != "timestamp"]
+
+    if configuration.rolling_aggregates:
+        aggregate = RollingWindowAggregate(
+            configuration.ceph_sli,
+            sli_name,
+            quantity=quantity,
+            key_columns=key_columns,
+            store=configuration.store_rolling_aggregates,
+        )
+        return aggregate.evaluate(
+            start_date,
+            end_date,
+            retrieve=lambda days: retrieve_thoth_sli_days_from_ceph(
+                configuration.ceph_sli,
+                sli_name,
+                days=days,
+                total_columns=columns,
+                max_workers=configuration.ceph_concurrency,
+            ),
+        )
+
+    window_df = retrieve_thoth_sli_window_from_ceph(
+        configuration.ceph_sli,
+        sli_name=sli_name,
+        start_date=start_date,
+        end_date=end_date,
+        total_columns=columns,
+        max_workers=configuration.ceph_concurrency,
+    )
+
+    return merge_daily_totals(
+        evaluate_daily_totals(daily_df, quantity, key_columns or [quantity]) for _, daily_df in window_df.groupby("date", sort=False)
+    )
+
+
 def evaluate_total_data_window_days(
     sli_name: str,
     total_columns: List[str],
@@ -209,39 +677,12 @@ def evaluate_total_data_window_days(
     html_inputs: Dict[str, Any] = {}
     total_quantity: Dict[str, Any] = {}
 
-    number_days = configuration.adviser_inputs_analysis_days
-
-    delta = datetime.timedelta(days=1)
-
     if not configuration.dry_run:
 
-        e_time = configuration.start_time.strftime("%Y-%m-%d").split("-")
-        current_end_time = datetime.date(
-            year=int(e_time[0]),
-            month=int(e_time[1]),
-            day=int(e_time[2]),
-        ) + datetime.timedelta(days=1)
-        current_initial_date = current_end_time - datetime.timedelta(days=number_days)
-
-        while current_initial_date < current_end_time:
-
-            _LOGGER.info(f"Analyzing for start date: {current_initial_date}")
-
-            sli_path = f"{sli_name}/{sli_name}-{current_initial_date}.csv"
-            daily_quantity_df = retrieve_thoth_sli_from_ceph(
-                configuration.ceph_sli,
-                sli_path,
-                [c for c in total_columns if c != "timestamp"],
-            )
-
-            for parameter in daily_quantity_df[quantity].unique():
-                subset_df = daily_quantity_df[daily_quantity_df[quantity] == parameter]
-                if parameter not in total_quantity:
-                    total_quantity[parameter] = subset_df["total"].values[0]
-                else:
-                    total_quantity[parameter] += subset_df["total"].values[0]
-
-            current_initial_date += delta
+        total_quantity = {
+            parameter: totals["counts"]
+            for parameter, totals in evaluate_adviser_inputs_totals(sli_name, total_columns, quantity, configuration).items()
+        }
 
         total_ = 0
         for _, total_counts in total_quantity.items():